@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import timeit
+import tracemalloc
+
+from pymodbus.constants import Endian
+from pymodbus.payload import BinaryPayloadDecoder
+import solaredge_modbus
+from solaredge_modbus.simulator import Simulator
+
+
+REGISTERS = [0x4142, 0x4344, 0x4546, 0x4748, 0x494a, 0x4b4c, 0x4d4e, 0x4f50] * 2
+
+LENGTHS = {
+    "UINT16": 1,
+    "INT16": 1,
+    "UINT32": 2,
+    "ACC32": 2,
+    "INT32": 2,
+    "FLOAT32": 2,
+    "SEFLOAT": 2,
+    "UINT64": 4,
+    "STRING": 16,
+}
+
+
+def measure(name, func, simulator, repeat):
+    # Best time per call, Modbus round trips per call, and peak memory
+    # allocated during a call
+    func()
+
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    requests = simulator.requests
+    tracemalloc.start()
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": name,
+        "time": best,
+        "round_trips": simulator.requests - requests,
+        "allocated": peak,
+    }
+
+
+def benchmarks(inverter):
+    devices = [
+        inverter,
+        solaredge_modbus.StorEdge(parent=inverter),
+        solaredge_modbus.Meter(offset=0, parent=inverter),
+        solaredge_modbus.Battery(offset=0, parent=inverter),
+    ]
+
+    for dtype in solaredge_modbus.registerDataType:
+        length = LENGTHS[dtype.name]
+        vtype = str if dtype == solaredge_modbus.registerDataType.STRING else float
+
+        yield f"decode_value/{dtype.name}", lambda length=length, dtype=dtype, vtype=vtype: inverter._decode_value(
+            BinaryPayloadDecoder.fromRegisters(REGISTERS[:length], byteorder=Endian.BIG, wordorder=Endian.BIG),
+            length, dtype, vtype
+        )
+
+    for device in devices:
+        registers = {k: v for k, v in device.registers.items() if v[2] == solaredge_modbus.registerType.HOLDING}
+        batches = sorted(set(v[7] for v in registers.values()))
+
+        yield f"plan/{device.model}", lambda device=device, registers=registers: device._build_plan(registers)
+
+        for batch in batches:
+            block = {k: v for k, v in registers.items() if v[7] == batch}
+            offset, length = device._span(block)
+            data = device._read_holding_block(offset, length)
+
+            yield f"decode_block/{device.model}/{batch}", lambda device=device, block=block, data=data: device._decoder(block).decode_payload(data)
+            yield f"read_batch/{device.model}/{batch}", lambda device=device, block=block: device._read_all(block, solaredge_modbus.registerType.HOLDING)
+
+        yield f"read_all/{device.model}", device.read_all
+
+    yield "discover", lambda: inverter.discover(refresh=True)
+    yield "meters", inverter.meters
+    yield "batteries", inverter.batteries
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    previous = {result["name"]: result for result in baseline}
+
+    for result in results:
+        before = previous.get(result["name"])
+
+        if not before:
+            continue
+
+        if result["time"] > before["time"] * (1 + threshold):
+            regressions.append(f"{result['name']}: {before['time'] * 1e6:.1f} us -> {result['time'] * 1e6:.1f} us")
+        if result["round_trips"] > before["round_trips"]:
+            regressions.append(f"{result['name']}: {before['round_trips']} -> {result['round_trips']} round trips")
+        if result["allocated"] > before["allocated"] * (1 + threshold):
+            regressions.append(f"{result['name']}: {before['allocated']} B -> {result['allocated']} B allocated")
+
+    return regressions
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--rtt", type=float, default=0.001, help="Simulated round trip time in seconds")
+    argparser.add_argument("--repeat", type=int, default=3, help="Timing runs per benchmark, the best is kept")
+    argparser.add_argument("--filter", type=str, default="", help="Only run benchmarks whose name contains this")
+    argparser.add_argument("--json", type=str, help="Write results to this file")
+    argparser.add_argument("--compare", type=str, help="Compare against results written earlier with --json")
+    argparser.add_argument("--threshold", type=float, default=0.2, help="Slowdown reported as a regression")
+    args = argparser.parse_args()
+
+    simulator = Simulator(units=1, meters=1, batteries=1, latency=args.rtt, seed=1)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(simulator.start("127.0.0.1", 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=server.sockets[0].getsockname()[1])
+    results = []
+
+    print(f"{'benchmark':40} {'time':>12} {'round trips':>12} {'allocated':>12}")
+
+    for name, func in benchmarks(inverter):
+        if args.filter not in name:
+            continue
+
+        result = measure(name, func, simulator, args.repeat)
+        results.append(result)
+
+        print(f"{name:40} {result['time'] * 1e6:>9.1f} us {result['round_trips']:>12} {result['allocated']:>10} B")
+
+    inverter.disconnect()
+    loop.call_soon_threadsafe(simulator.close)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+        for regression in regressions:
+            print(f"regression: {regression}")
+
+        if regressions:
+            sys.exit(1)
@@ -2,13 +2,12 @@
 
 import argparse
 import sys
-import time
 
-from influxdb import InfluxDBClient
 from influxdb_client import InfluxDBClient, Point
 from influxdb_client.client.write_api import SYNCHRONOUS
 import requests
 import solaredge_modbus
+from solaredge_modbus.writer import LineProtocolWriter
 
 
 if __name__ == "__main__":
@@ -22,6 +21,7 @@ if __name__ == "__main__":
     argparser.add_argument("--influx_org", type=str, help="InfluxDB organisation")
     argparser.add_argument("--influx_bucket", type=str, default="solaredge", help="InfluxDB bucket")
     argparser.add_argument("--influx_token", type=str, help="InfluxDB token")
+    argparser.add_argument("--spool", type=str, help="Directory to buffer points in while the database is unavailable")
     args = argparser.parse_args()
 
     try:
@@ -31,6 +31,9 @@ if __name__ == "__main__":
             org=args.influx_org,
         )
         influx = influx_client.write_api(write_options=SYNCHRONOUS)
+
+        def send(lines):
+            influx.write(bucket=args.influx_bucket, org=args.influx_org, record=lines)
     except (ConnectionRefusedError, requests.exceptions.ConnectionError):
         print(f"Database connection failed: {args.influx_url}")
         sys.exit()
@@ -42,100 +45,63 @@ if __name__ == "__main__":
         unit=args.unit
     )
 
-    while True:
-        values = {}
-        values = inverter.read_all()
-        meters = inverter.meters()
-        batteries = inverter.batteries()
-
-        json_body = []
-        current_time = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-
-        inverter_data = {
-            "measurement": "inverter",
-            "tags": {
-                "c_manufacturer": values["c_manufacturer"],
-                "c_model": values["c_model"],
-                "c_version": values["c_version"],
-                "c_serialnumber": values["c_serialnumber"],
-                "c_deviceaddress": values["c_deviceaddress"],
-                "c_sunspec_did": values["c_sunspec_did"]
-            },
-            "time": current_time,
-            "fields": {}
-        }
-
-        for k, v in values.items():
-            if (isinstance(v, int) or isinstance(v, float)) and "_scale" not in k:
-                k_split = k.split("_")
-                scale = 0
-
-                if f"{k_split[len(k_split) - 1]}_scale" in values:
-                    scale = values[f"{k_split[len(k_split) - 1]}_scale"]
-                elif f"{k}_scale" in values:
-                    scale = values[f"{k}_scale"]
-
-                inverter_data["fields"].update({k: float(v * (10 ** scale))})
-
-        json_body.append(inverter_data)
-
-        for meter, params in meters.items():
-            meter_values = params.read_all()
-
-            meter_data = {
-                "measurement": "meter",
-                "tags": {
-                    "c_manufacturer": meter_values["c_manufacturer"],
-                    "c_model": meter_values["c_model"],
-                    "c_option": meter_values["c_option"],
-                    "c_version": meter_values["c_version"],
-                    "c_serialnumber": meter_values["c_serialnumber"],
-                    "c_deviceaddress": meter_values["c_deviceaddress"],
-                    "c_sunspec_did": meter_values["c_sunspec_did"]
-                },
-                "time": current_time,
-                "fields": {}
-            }
-
-            for k, v in meter_values.items():
-                if (isinstance(v, int) or isinstance(v, float)) and "_scale" not in k:
-                    k_split = k.split("_")
-                    scale = 0
-
-                    if f"{k_split[len(k_split) - 1]}_scale" in meter_values:
-                        scale = meter_values[f"{k_split[len(k_split) - 1]}_scale"]
-                    elif f"{k}_scale" in meter_values:
-                        scale = meter_values[f"{k}_scale"]
-
-                    meter_data["fields"].update({k: float(v * (10 ** scale))})
-
-            json_body.append(meter_data)
-
-        for battery, params in batteries.items():
-            battery_values = params.read_all()
+    writer = LineProtocolWriter(send, spool=args.spool)
 
-            if not battery_values["c_model"]:
-                continue
-
-            battery_data = {
-                "measurement": "battery",
-                "tags": {
-                    "c_manufacturer": battery_values["c_manufacturer"],
-                    "c_model": battery_values["c_model"],
-                    "c_version": battery_values["c_version"],
-                    "c_serialnumber": battery_values["c_serialnumber"],
-                    "c_deviceaddress": battery_values["c_deviceaddress"],
-                    "c_sunspec_did": battery_values["c_sunspec_did"]
+    try:
+        for timestamp, values in inverter.stream(args.interval, scaled=True):
+            meters = inverter.meters()
+            batteries = inverter.batteries()
+
+            writer.write(
+                "inverter",
+                {
+                    "c_manufacturer": values["c_manufacturer"],
+                    "c_model": values["c_model"],
+                    "c_version": values["c_version"],
+                    "c_serialnumber": values["c_serialnumber"],
+                    "c_deviceaddress": values["c_deviceaddress"],
+                    "c_sunspec_did": values["c_sunspec_did"]
                 },
-                "time": current_time,
-                "fields": {}
-            }
-
-            for k, v in battery_values.items():
-                if isinstance(v, int) or isinstance(v, float):
-                    battery_data["fields"].update({k: v})
-
-            json_body.append(battery_data)
-
-        influx.write(args.influx_db, org, json_body)
-        time.sleep(args.interval)
+                {k: float(v) for k, v in values.items() if (isinstance(v, int) or isinstance(v, float)) and "_scale" not in k},
+                timestamp
+            )
+
+            for meter, params in meters.items():
+                meter_values = params.read_all(scaled=True)
+
+                writer.write(
+                    "meter",
+                    {
+                        "c_manufacturer": meter_values["c_manufacturer"],
+                        "c_model": meter_values["c_model"],
+                        "c_option": meter_values["c_option"],
+                        "c_version": meter_values["c_version"],
+                        "c_serialnumber": meter_values["c_serialnumber"],
+                        "c_deviceaddress": meter_values["c_deviceaddress"],
+                        "c_sunspec_did": meter_values["c_sunspec_did"]
+                    },
+                    {k: float(v) for k, v in meter_values.items() if (isinstance(v, int) or isinstance(v, float)) and "_scale" not in k},
+                    timestamp
+                )
+
+            for battery, params in batteries.items():
+                battery_values = params.read_all()
+
+                if not battery_values["c_model"]:
+                    continue
+
+                writer.write(
+                    "battery",
+                    {
+                        "c_manufacturer": battery_values["c_manufacturer"],
+                        "c_model": battery_values["c_model"],
+                        "c_version": battery_values["c_version"],
+                        "c_serialnumber": battery_values["c_serialnumber"],
+                        "c_deviceaddress": battery_values["c_deviceaddress"],
+                        "c_sunspec_did": battery_values["c_sunspec_did"]
+                    },
+                    {k: v for k, v in battery_values.items() if isinstance(v, int) or isinstance(v, float)},
+                    timestamp
+                )
+    except KeyboardInterrupt:
+        writer.close(timeout=10)
@@ -1,17 +1,45 @@
+import array
+import asyncio
+import collections
+import collections.abc
 import enum
+import struct
+import threading
 import time
+import types
 
 from pymodbus.constants import Endian
 from pymodbus.payload import BinaryPayloadBuilder
 from pymodbus.payload import BinaryPayloadDecoder
 from pymodbus.client import ModbusTcpClient
 from pymodbus.client import ModbusSerialClient
+from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.client import AsyncModbusSerialClient
+from pymodbus.exceptions import ModbusException
+from pymodbus.pdu import ExceptionResponse
 from pymodbus.register_read_message import ReadHoldingRegistersResponse
 
+from .delta import Delta
+from .metrics import Metrics  # noqa: F401
+from .metrics import READ_HOLDING_REGISTERS
+from .metrics import WRITE_MULTIPLE_REGISTERS
+from .retry import CircuitBreaker
+from .retry import RetryPolicy
+from .retry import circuitState  # noqa: F401
+from .scheduler import next_tick
+from .transport import TRANSPORTS
+from .transport import SerialBus
+from .transport import SharedClient
+
 
 RETRIES = 3
 TIMEOUT = 1
 UNIT = 1
+MAX_GAP = 64
+MAX_REGISTERS = 125
+MAX_WRITE_REGISTERS = 123
+PLAN_CACHE_SIZE = 256
+BLOCK_CACHE_SIZE = 1024
 
 
 class sunspecDID(enum.Enum):
@@ -76,19 +104,36 @@ class registerDataType(enum.Enum):
     STRING = 9
 
 
+# Not implemented values, as they decode. Signed types are negative. Scale
+# factors are left as they are, -32768 is out of the SunSpec range of -10 to
+# 10, so scaling treats the values they apply to as not implemented.
 SUNSPEC_NOTIMPLEMENTED = {
     "UINT16": 0xffff,
     "UINT32": 0xffffffff,
     "UINT64": 0xffffffffffffffff,
-    "INT16": 0x8000,
-    "INT32": 0x80000000,
-    "SCALE": 0x8000,
+    "INT16": -0x8000,
+    "INT32": -0x80000000,
+    "SCALE": -0x8000,
     "ACC32": 0x00000000,
     "FLOAT32": 0x7fc00000,
     "SEFLOAT": 0xffffffff,
     "STRING": ""
 }
 
+POW10 = {scale: 10.0 ** scale for scale in range(-10, 11)}
+
+STRUCT_FORMATS = {
+    "UINT16": "H",
+    "UINT32": "I",
+    "UINT64": "Q",
+    "INT16": "h",
+    "INT32": "i",
+    "SCALE": "h",
+    "ACC32": "I",
+    "FLOAT32": "f",
+    "SEFLOAT": "f",
+}
+
 C_SUNSPEC_DID_MAP = {
     "101": "Single Phase Inverter",
     "102": "Split Phase Inverter",
@@ -185,6 +230,285 @@ BATTERY_REGISTER_OFFSETS = [
     0x100
 ]
 
+# address, length, register type, data type, value type, description, unit, batch
+Register = collections.namedtuple("Register", ["address", "length", "rtype", "dtype", "vtype", "label", "unit", "batch"])
+
+
+class ReadHoldingBlockResponse(ReadHoldingRegistersResponse):
+
+    # Keeps the register data of a response as the big endian bytes it was
+    # received in, so blocks are decoded straight from the PDU instead of
+    # through a list of registers. That list is only built when asked for.
+    payload = b""
+
+    def decode(self, data):
+        byte_count = int(data[0])
+        self.payload = memoryview(data)[1:byte_count + 1]
+        self._registers = None
+
+    @property
+    def registers(self):
+        if self._registers is None:
+            self._registers = list(struct.unpack(f">{len(self.payload) // 2}H", self.payload))
+
+        return self._registers
+
+    @registers.setter
+    def registers(self, values):
+        self._registers = values
+
+
+class BlockDecoder:
+
+    def __init__(self, values, offset, wordorder):
+        # Compile a block of registers into a single struct format, plus the
+        # post-processing needed per value. Little endian word order is
+        # handled by swapping the bytes of every register first, which leaves
+        # every multi-word value in the right order for a little endian
+        # unpack, at the cost of swapping the bytes of strings back. Every
+        # value also gets its own struct, to decode it on its own.
+        byteorder = "<" if wordorder == Endian.LITTLE else ">"
+        position = offset
+        fmt = [byteorder]
+        self.rules = []
+        self.fields = {}
+
+        for k, v in sorted(values.items(), key=lambda item: item[1].address):
+            address, length, rtype, dtype, vtype, label, unit, batch = v
+
+            if address > position:
+                fmt.append(f"{(address - position) * 2}x")
+
+            if dtype == registerDataType.STRING:
+                size = length * 2
+                value = f"{size}s"
+            elif dtype.name in STRUCT_FORMATS:
+                size = struct.calcsize(f"={STRUCT_FORMATS[dtype.name]}")
+                value = STRUCT_FORMATS[dtype.name]
+            else:
+                raise NotImplementedError(dtype)
+
+            fmt.append(value)
+
+            if (length * 2) > size:
+                fmt.append(f"{(length * 2) - size}x")
+
+            if isinstance(k, str) and k.endswith("_scale"):
+                notimplemented = None
+            else:
+                notimplemented = SUNSPEC_NOTIMPLEMENTED[dtype.name]
+
+            rule = (k, dtype == registerDataType.STRING, vtype, notimplemented)
+            self.rules.append(rule)
+            self.fields[k] = ((address - offset) * 2, length, struct.Struct(f"{byteorder}{value}"), rule)
+            position = address + length
+
+        self.swap_strings = (byteorder == "<")
+        self.length = position - offset
+        self.registers = struct.Struct(f">{self.length}H")
+        self.values = struct.Struct("".join(fmt))
+
+    def decode(self, registers):
+        return self.decode_payload(self.registers.pack(*registers))
+
+    def prepare(self, payload):
+        # Big endian register data, as received on the wire, is unpacked
+        # without a copy. Little endian blocks need the bytes of every
+        # register swapped, in a single array copy.
+        if not self.swap_strings:
+            return payload
+
+        swapped = array.array("H")
+        swapped.frombytes(payload[:self.length * 2])
+        swapped.byteswap()
+
+        return swapped
+
+    def decode_payload(self, payload):
+        return self.unpack(self.prepare(payload))
+
+    def unpack(self, prepared):
+        results = {}
+
+        for decoded, (k, string, vtype, notimplemented) in zip(self.values.unpack_from(prepared), self.rules):
+            if string:
+                if self.swap_strings:
+                    swapped = bytearray(decoded)
+                    swapped[0::2], swapped[1::2] = decoded[1::2], decoded[0::2]
+                    decoded = bytes(swapped)
+
+                decoded = decoded.decode(encoding="utf-8", errors="ignore").replace("\x00", "").rstrip()
+
+            if decoded == notimplemented or decoded != decoded:
+                results[k] = vtype(False)
+            else:
+                results[k] = vtype(decoded)
+
+        return results
+
+    def unpack_value(self, prepared, key):
+        position, length, value, (k, string, vtype, notimplemented) = self.fields[key]
+        decoded, = value.unpack_from(prepared, position)
+
+        if string:
+            if self.swap_strings:
+                swapped = bytearray(decoded)
+                swapped[0::2], swapped[1::2] = decoded[1::2], decoded[0::2]
+                decoded = bytes(swapped)
+
+            decoded = decoded.decode(encoding="utf-8", errors="ignore").replace("\x00", "").rstrip()
+
+        if decoded == notimplemented or decoded != decoded:
+            return vtype(False)
+
+        return vtype(decoded)
+
+
+class LazyValues(collections.abc.Mapping):
+
+    def __init__(self, values=None, scales=None):
+        # A read-only mapping of the values in the blocks read, which keeps
+        # their raw register data and decodes, and scales, each value when it
+        # is first looked up. values holds those that are already decoded,
+        # such as a cached identity.
+        self._values = dict(values or {})
+        self._decoded = {}
+        self._blocks = []
+        self._scales = scales or {}
+
+    def __repr__(self):
+        return f"LazyValues({len(self)} values, {len(self._decoded)} decoded)"
+
+    def add(self, decoder, payload):
+        self._blocks.append((decoder, payload, decoder.prepare(payload)))
+
+    def _block(self, key):
+        for block in self._blocks:
+            if key in block[0].fields:
+                return block
+
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        if key in self._decoded:
+            return self._decoded[key]
+        if key in self._values:
+            return self._values[key]
+
+        decoder, payload, prepared = self._block(key)
+        value = decoder.unpack_value(prepared, key)
+
+        if key in self._scales and self._scales[key] in self:
+            value = value * POW10.get(self[self._scales[key]], 0.0)
+
+        self._decoded[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self._values or any(key in block[0].fields for block in self._blocks)
+
+    def __iter__(self):
+        yield from self._values
+
+        for decoder, payload, prepared in self._blocks:
+            yield from decoder.fields
+
+    def __len__(self):
+        return len(self._values) + sum(len(block[0].fields) for block in self._blocks)
+
+    def raw(self, key):
+        # The registers of a value as read, or None for a value that was not
+        # read from the device
+        if key in self._values:
+            return None
+
+        decoder, payload, prepared = self._block(key)
+        position, length, value, rule = decoder.fields[key]
+
+        return list(struct.unpack_from(f">{length}H", payload, position))
+
+    def to_dict(self):
+        results = dict(self._values)
+
+        for decoder, payload, prepared in self._blocks:
+            results.update(decoder.unpack(prepared))
+
+        for k, v in results.items():
+            if k in self._scales and self._scales[k] in results:
+                results[k] = v * POW10.get(results[self._scales[k]], 0.0)
+
+        return results
+
+
+class Block:
+
+    # A planned read: the span of registers to request and the decoder for
+    # the values in it, computed once when the plan is built
+    __slots__ = ("offset", "length", "values", "decoder")
+
+    def __init__(self, values, offset, length, decoder):
+        self.values = values
+        self.offset = offset
+        self.length = length
+        self.decoder = decoder
+
+    def __repr__(self):
+        return f"Block(offset={hex(self.offset)}, length={self.length}, values={len(self.values)})"
+
+
+class LRUCache:
+
+    # Holds up to size entries, dropping the least recently used one first
+    def __init__(self, size):
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"LRUCache({len(self.entries)} entries, size={self.size})"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        # Lookups are on the hot path, so they do not take the lock. Each
+        # operation is atomic, and an entry dropped in between is still returned.
+        value = self.entries.get(key)
+
+        if value is not None:
+            try:
+                self.entries.move_to_end(key)
+            except KeyError:
+                pass
+
+        return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class Topology:
+
+    def __init__(self, meters, batteries, session=None):
+        self.meters = meters
+        self.batteries = batteries
+        self.session = session
+        self.timestamp = time.monotonic()
+
+    def __repr__(self):
+        return f"Topology(meters={list(self.meters)}, batteries={list(self.batteries)})"
+
 
 class SolarEdge:
 
@@ -193,17 +517,49 @@ class SolarEdge:
     parity = "N"
     baud = 115200
     wordorder = Endian.BIG
+    little_endian_registers = frozenset()
+    registers = types.MappingProxyType({})
+    offset = 0
+
+    # Tables and scale factors are kept per device class and offset. Plans
+    # and blocks also depend on the keys read, so only the most recently
+    # used ones are kept.
+    _tables = {}
+    _plans = LRUCache(PLAN_CACHE_SIZE)
+    _blocks = LRUCache(BLOCK_CACHE_SIZE)
+    _scales = {}
 
     def __init__(
         self, host=False, port=False,
         device=False, stopbits=False, parity=False, baud=False,
         timeout=TIMEOUT, retries=RETRIES, unit=UNIT,
-        parent=False
+        parent=False, max_gap=False,
+        cache_identity=False, identity_ttl=False,
+        retry_policy=False, breaker=False, deadbands=False,
+        metrics=False, capture=False
     ):
-        self.little_endian_registers = set()
+        self.metrics = metrics
+        self.capture = capture
+        self.delta = Delta(deadbands)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_gap = MAX_GAP if max_gap is False else max_gap
+        self.cache_identity = cache_identity
+        self.identity_ttl = identity_ttl
+        self._identity = None
+        self._identity_session = None
+        self._identity_time = 0
+        self._request_failed = False
 
         if parent:
-            self.client = parent.client
+            self.client = self._retain_client(parent.client)
+            self.metrics = metrics or parent.metrics
+            self.capture = capture or parent.capture
+            self.delta = Delta(deadbands or parent.delta.deadbands)
+            self.retry_policy = retry_policy or parent.retry_policy
+            self.max_gap = parent.max_gap if max_gap is False else max_gap
+            self.cache_identity = cache_identity or parent.cache_identity
+            self.identity_ttl = identity_ttl or parent.identity_ttl
             self.mode = parent.mode
             self.timeout = parent.timeout
             self.retries = parent.retries
@@ -212,6 +568,11 @@ class SolarEdge:
             else:
                 self.unit = parent.unit
 
+            # Meters and batteries are read through the same device as their
+            # parent, so they share its breaker. Other units get their own.
+            if not breaker and self.unit == parent.unit:
+                self.breaker = parent.breaker
+
             if self.mode is connectionType.RTU:
                 self.device = parent.device
                 self.stopbits = parent.stopbits
@@ -243,20 +604,10 @@ class SolarEdge:
 
             if device:
                 self.mode = connectionType.RTU
-                self.client = ModbusSerialClient(
-                    method="rtu",
-                    port=self.device,
-                    stopbits=self.stopbits,
-                    parity=self.parity,
-                    baudrate=self.baud,
-                    timeout=self.timeout)
             else:
                 self.mode = connectionType.TCP
-                self.client = ModbusTcpClient(
-                    host=self.host,
-                    port=self.port,
-                    timeout=self.timeout
-                )
+
+            self.client = self._acquire_client()
 
     def __repr__(self):
         if self.mode == connectionType.RTU:
@@ -266,33 +617,126 @@ class SolarEdge:
         else:
             return f"<{self.__class__.__module__}.{self.__class__.__name__} object at {hex(id(self))}>"
 
-    def _read_holding_registers(self, address, length):
-        # Check if the register needs little endian
-        wordorder = Endian.LITTLE if address in self.little_endian_registers else self.wordorder
+    def _endpoint(self):
+        if self.mode is connectionType.RTU:
+            return (self.mode, self.device)
+        else:
+            return (self.mode, self.host, self.port)
+
+    def _acquire_client(self):
+        # Devices on the same endpoint share one client, as only a single
+        # Modbus connection is accepted at a time. Devices on a serial line
+        # share a bus that schedules their requests.
+        if self.mode is connectionType.RTU:
+            bus = TRANSPORTS.acquire(self._endpoint(), self._create_client, self, SerialBus)
+            bus.check(self.baud, self.parity, self.stopbits)
+
+            return bus
+        else:
+            return TRANSPORTS.acquire(self._endpoint(), self._create_client, self, SharedClient)
+
+    def _retain_client(self, client):
+        return TRANSPORTS.retain(client, self)
+
+    def _create_client(self):
+        if self.mode is connectionType.RTU:
+            client = ModbusSerialClient(
+                method="rtu",
+                port=self.device,
+                stopbits=self.stopbits,
+                parity=self.parity,
+                baudrate=self.baud,
+                timeout=self.timeout)
+        else:
+            client = ModbusTcpClient(
+                host=self.host,
+                port=self.port,
+                timeout=self.timeout
+            )
+
+        client.register(ReadHoldingBlockResponse)
+        return client
+
+    def _read_holding_block(self, address, length):
+        # Fail fast while the device is known to be unreachable, or once a
+        # request of the same read has failed
+        if self._request_failed or not self.breaker.allow():
+            return None
+
+        metrics = self.metrics
 
         for i in range(self.retries):
+            if i:
+                if metrics:
+                    metrics.retry(self)
+
+                time.sleep(self.retry_policy.delay(i - 1))
+
             if not self.connected():
-                self.connect()
-                time.sleep(0.1)
-                continue
+                connected = self.connect()
 
-            result = self.client.read_holding_registers(address, length, slave=self.unit)
-            if not isinstance(result, ReadHoldingRegistersResponse):
-                continue
-            if len(result.registers) != length:
+                if metrics:
+                    metrics.connect(self, connected)
+                if not connected:
+                    continue
+
+            start = time.perf_counter() if metrics else 0
+
+            try:
+                result = self.client.read_holding_registers(address, length, slave=self.unit)
+            except ModbusException:
+                result = None
+
+            ok = isinstance(result, ReadHoldingBlockResponse) and len(result.payload) == (length * 2)
+
+            if metrics:
+                metrics.request(self, READ_HOLDING_REGISTERS, address, length, time.perf_counter() - start, ok)
+
+            # The device answered with a Modbus exception, so it is reachable
+            # and asking again will not change its answer
+            if isinstance(result, ExceptionResponse):
+                self.breaker.success()
+                return None
+            if not ok:
                 continue
 
-            return BinaryPayloadDecoder.fromRegisters(result.registers, byteorder=Endian.BIG, wordorder=wordorder)
+            if self.capture:
+                self.capture.record(self, address, result.payload)
 
+            self.breaker.success()
+            return result.payload
+
+        self._request_failed = True
         return None
 
+    def _read_holding_registers(self, address, length):
+        # Check if the register needs little endian
+        wordorder = Endian.LITTLE if address in self.little_endian_registers else self.wordorder
+        payload = self._read_holding_block(address, length)
+
+        if payload is None:
+            return None
+
+        return BinaryPayloadDecoder(bytes(payload), byteorder=Endian.BIG, wordorder=wordorder)
+
     def _write_holding_register(self, address, value, dtype):
         # Determine byte order based on address
         wordorder = Endian.LITTLE if address in self.little_endian_registers else self.wordorder
 
         # Use dtype and wordorder to encode the value properly
         encoded_value = self._encode_value(value, dtype, wordorder)
-        return self.client.write_registers(address=address, values=encoded_value, slave=self.unit)
+
+        return self._write_holding_block(address, encoded_value)
+
+    def _write_holding_block(self, address, registers):
+        if not self.metrics:
+            return self.client.write_registers(address=address, values=registers, slave=self.unit)
+
+        start = time.perf_counter()
+        result = self.client.write_registers(address=address, values=registers, slave=self.unit)
+        self.metrics.request(self, WRITE_MULTIPLE_REGISTERS, address, len(registers), time.perf_counter() - start, not result.isError())
+
+        return result
 
     def _encode_value(self, data, dtype, wordorder):
         builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=wordorder)
@@ -319,7 +763,7 @@ class SolarEdge:
             raise
         return builder.to_registers()
 
-    def _decode_value(self, data, length, dtype, vtype):
+    def _decode_value(self, data, length, dtype, vtype, scale=False):
         try:
             if dtype == registerDataType.INT16:
                 decoded = data.decode_16bit_int()
@@ -339,7 +783,7 @@ class SolarEdge:
                 decoded = data.decode_string(length * 2).decode(encoding="utf-8", errors="ignore").replace("\x00", "").rstrip()
             else:
                 raise NotImplementedError(dtype)
-            if decoded == SUNSPEC_NOTIMPLEMENTED[dtype.name]:
+            if decoded == SUNSPEC_NOTIMPLEMENTED[dtype.name] and not scale:
                 return vtype(False)
             elif decoded != decoded:
                 return vtype(False)
@@ -348,13 +792,13 @@ class SolarEdge:
         except NotImplementedError:
             raise
 
-    def _read(self, value):
+    def _read(self, value, scale=False):
         address, length, rtype, dtype, vtype, label, fmt, batch = value
         try:
             if rtype == registerType.INPUT:
-                return self._decode_value(self._read_input_registers(address, length), length, dtype, vtype)
+                return self._decode_value(self._read_input_registers(address, length), length, dtype, vtype, scale)
             elif rtype == registerType.HOLDING:
-                return self._decode_value(self._read_holding_registers(address, length), length, dtype, vtype)
+                return self._decode_value(self._read_holding_registers(address, length), length, dtype, vtype, scale)
             else:
                 raise NotImplementedError(rtype)
         except NotImplementedError:
@@ -362,13 +806,13 @@ class SolarEdge:
         except AttributeError:
             return False
 
-    def _read_all(self, values, rtype):
+    def _span(self, values):
         addr_min = False
         addr_max = False
 
         for k, v in values.items():
-            v_addr = v[0]
-            v_length = v[1]
+            v_addr = v.address
+            v_length = v.length
 
             if addr_min is False:
                 addr_min = v_addr
@@ -380,35 +824,96 @@ class SolarEdge:
             if (v_addr + v_length) > addr_max:
                 addr_max = v_addr + v_length
 
-        results = {}
-        offset = addr_min
-        length = addr_max - addr_min
+        return addr_min, addr_max - addr_min
+
+    def _index_key(self):
+        # Plans, decoders and scale factors only depend on the register
+        # table, word order and max_gap, so devices that have the same ones
+        # share them
+        return (type(self)._register_map.__func__, self.offset, self.wordorder, self.max_gap)
+
+    def _block(self, values):
+        block_key = (self._index_key(), tuple(values))
+        block = SolarEdge._blocks.get(block_key)
+
+        if block is None:
+            offset, length = self._span(values)
+            block = SolarEdge._blocks.put(block_key, Block(values, offset, length, BlockDecoder(values, offset, self._wordorder(offset))))
 
+        return block
+
+    def _decoder(self, values):
+        return self._block(values).decoder
+
+    def _read_payload(self, block, rtype):
+        if rtype == registerType.INPUT:
+            return self._read_input_block(block.offset, block.length)
+        elif rtype == registerType.HOLDING:
+            return self._read_holding_block(block.offset, block.length)
+        else:
+            raise NotImplementedError(rtype)
+
+    def _read_block(self, block, rtype, delta=False):
         try:
-            if rtype == registerType.INPUT:
-                data = self._read_input_registers(offset, length)
-            elif rtype == registerType.HOLDING:
-                data = self._read_holding_registers(offset, length)
-            else:
-                raise NotImplementedError(rtype)
+            data = self._read_payload(block, rtype)
 
             if not data:
-                return results
+                return {}
 
-            for k, v in values.items():
-                address, length, rtype, dtype, vtype, label, fmt, batch = v
+            start = time.perf_counter() if self.metrics else 0
 
-                if address > offset:
-                    skip_bytes = address - offset
-                    offset += skip_bytes
-                    data.skip_bytes(skip_bytes * 2)
+            if delta:
+                decoded = self.delta.decode(block, data, block.decoder)
+            else:
+                decoded = block.decoder.decode_payload(data)
 
-                results[k] = self._decode_value(data, length, dtype, vtype)
-                offset += length
+            if self.metrics:
+                self.metrics.decode(self, block.offset, block.length, time.perf_counter() - start)
+
+            return decoded
         except NotImplementedError:
             raise
 
-        return results
+    def _read_all(self, values, rtype, delta=False):
+        return self._read_block(self._block(values), rtype, delta)
+
+    def _settle(self):
+        # The breaker counts one failure per read that had a request fail,
+        # however many requests it was planned into
+        if self._request_failed:
+            self._request_failed = False
+            self.breaker.failure()
+
+    def _session(self):
+        return self.client.socket
+
+    def _cached(self, rtype, keys=None):
+        # Serve the static identity registers from memory while the cache is
+        # valid, and return the keys that still need to be read.
+        if not self.cache_identity or self._identity is None:
+            return {}, keys
+
+        if (self._identity_session is not self._session()
+                or (self.identity_ttl and (time.monotonic() - self._identity_time) > self.identity_ttl)):
+            self.invalidate()
+            return {}, keys
+
+        if keys is None:
+            keys = frozenset(k for k, v in self.registers.items() if (v.rtype == rtype))
+
+        return {k: v for k, v in self._identity.items() if k in keys}, keys.difference(self._identity)
+
+    def _cache(self, results):
+        if not self.cache_identity or self._identity is not None:
+            return
+
+        # Only cache a complete identity block
+        keys = [k for k in self.registers if k.startswith("c_")]
+
+        if all(k in results for k in keys):
+            self._identity = {k: results[k] for k in keys}
+            self._identity_session = self._session()
+            self._identity_time = time.monotonic()
 
     def _write(self, value, data):
         # Unpack value tuple to extract necessary information
@@ -423,19 +928,30 @@ class SolarEdge:
             raise
 
     def connect(self):
+        # A device that was disconnected takes a reference to the client of
+        # its endpoint again
+        if not TRANSPORTS.holds(self):
+            self.client = self._acquire_client()
+
         return self.client.connect()
 
     def disconnect(self):
-        self.client.close()
+        # Other devices on the same endpoint keep using the client, so only
+        # this device lets go of it. It is closed once the last one does.
+        TRANSPORTS.detach(self)
 
     def connected(self):
-        return self.client.is_socket_open()
+        return TRANSPORTS.holds(self) and self.client.is_socket_open()
 
     def read(self, key):
         if key not in self.registers:
             raise KeyError(key)
 
-        return {key: self._read(self.registers[key])}
+        self._request_failed = False
+        value = self._read(self.registers[key], key.endswith("_scale"))
+        self._settle()
+
+        return {key: value}
 
     def write(self, key, data):
         if key not in self.registers:
@@ -443,46 +959,305 @@ class SolarEdge:
 
         return self._write(self.registers[key], data)
 
-    def read_all(self, rtype=registerType.HOLDING):
-        registers = {k: v for k, v in self.registers.items() if (v[2] == rtype)}
-        results = {}
+    def _write_plan(self, values, commit=False):
+        # Encode every value in the word order of its register, and merge
+        # values at adjacent addresses into as few writes as possible. The
+        # commit register is written last, on its own, so that it is only
+        # written once all settings are.
+        values = dict(values)
+
+        if commit:
+            values.setdefault("commit_power_control_settings", 1)
+
+        encoded = []
+
+        for key, data in values.items():
+            if key not in self.registers:
+                raise KeyError(key)
+
+            v = self.registers[key]
+
+            if v.rtype != registerType.HOLDING:
+                raise NotImplementedError(v.rtype)
+
+            encoded.append((key == "commit_power_control_settings", v.address, self._encode_value(data, v.dtype, self._wordorder(v.address))))
+
+        writes = []
+        block_end = None
+
+        for last, address, registers in sorted(encoded):
+            if (writes and not last
+                    and address == block_end
+                    and (len(writes[-1][1]) + len(registers)) <= MAX_WRITE_REGISTERS):
+                writes[-1][1].extend(registers)
+            else:
+                writes.append((address, list(registers)))
+
+            block_end = address + len(registers)
 
-        for batch in range(1, len(registers)):
-            register_batch = {k: v for k, v in registers.items() if (v[7] == batch)}
+        return writes
 
-            if not register_batch:
+    def write_many(self, values, commit=False):
+        # Returns the response of every write made, stopping at the first
+        # one that fails
+        results = []
+
+        for address, registers in self._write_plan(values, commit):
+            result = self._write_holding_block(address, registers)
+            results.append(result)
+
+            if result.isError():
                 break
 
-            results.update(self._read_all(register_batch, rtype))
+        return results
+
+    @classmethod
+    def _register_map(cls, offset):
+        return {}
+
+    @classmethod
+    def _register_table(cls, offset=0):
+        # Register tables are built once per device class and offset, and
+        # shared read-only by every device using them. Async devices share
+        # the tables of the device they extend.
+        key = (cls._register_map.__func__, offset)
+
+        if key not in SolarEdge._tables:
+            SolarEdge._tables[key] = types.MappingProxyType({k: Register(*v) for k, v in cls._register_map(offset).items()})
+
+        return SolarEdge._tables[key]
+
+    @classmethod
+    def _wordorder(cls, address):
+        return Endian.LITTLE if address in cls.little_endian_registers else cls.wordorder
+
+    def _build_plan(self, registers):
+        # Greedily pack registers, in address order, into as few reads as
+        # possible. A block is closed when the next register would exceed the
+        # Modbus read limit, leave a gap larger than max_gap, or needs a
+        # different word order.
+        blocks = []
+        block = {}
+        block_start = block_end = block_wordorder = None
+
+        for k, v in sorted(registers.items(), key=lambda item: item[1].address):
+            address, length = v.address, v.length
+            wordorder = self._wordorder(address)
+
+            if block and (
+                    (address - block_end) > self.max_gap
+                    or (max(block_end, address + length) - block_start) > MAX_REGISTERS
+                    or wordorder != block_wordorder):
+                blocks.append(block)
+                block = {}
+
+            if not block:
+                block_start = address
+                block_end = address
+                block_wordorder = wordorder
+
+            block[k] = v
+            block_end = max(block_end, address + length)
+
+        if block:
+            blocks.append(block)
+
+        return blocks
+
+    def _plan(self, rtype, keys=None):
+        plan_key = (self._index_key(), rtype, keys)
+        plan = SolarEdge._plans.get(plan_key)
+
+        if plan is None:
+            plan = SolarEdge._plans.put(plan_key, [
+                self._block(values)
+                for values in self._build_plan({k: v for k, v in self.registers.items() if (v.rtype == rtype and (keys is None or k in keys))})
+            ])
+
+        return plan
+
+    @classmethod
+    def _scale_table(cls, offset=0):
+        # Map every value register to the scale factor register it depends
+        # on. SunSpec names a scale factor after the values it applies to, so
+        # look for the longest run of words in the key that has a matching
+        # "_scale" register, e.g. l1_power_apparent -> power_apparent_scale.
+        scales_key = (cls._register_map.__func__, offset)
+
+        if scales_key not in SolarEdge._scales:
+            registers = cls._register_table(offset)
+            scales = {}
+
+            for k, v in registers.items():
+                if k.endswith("_scale") or v.dtype == registerDataType.STRING:
+                    continue
+
+                words = k.split("_")
+                candidates = (
+                    "_".join(words[start:start + size])
+                    for size in range(len(words), 0, -1)
+                    for start in range(len(words) - size + 1)
+                )
+
+                for candidate in candidates:
+                    if f"{candidate}_scale" in registers:
+                        scales[k] = f"{candidate}_scale"
+                        break
+
+            SolarEdge._scales[scales_key] = scales
+
+        return SolarEdge._scales[scales_key]
+
+    def _scale_index(self):
+        return self._scale_table(self.offset)
+
+    def _scaled(self, results):
+        return self._apply_scales(results, self._scale_index())
+
+    @staticmethod
+    def _apply_scales(results, scales):
+        # Apply scale factors in a single pass. A scale factor outside the
+        # SunSpec range of -10 to 10 is not implemented, so is its value.
+        for k, v in results.items():
+            if k in scales and scales[k] in results:
+                results[k] = v * POW10.get(results[scales[k]], 0.0)
 
         return results
 
+    def scale_registers(self):
+        return dict(self._scale_index())
+
+    def _many(self, keys):
+        for key in keys:
+            if key not in self.registers:
+                raise KeyError(key)
+
+        scales = self._scale_index()
+
+        return frozenset(keys).union(scales[k] for k in keys if k in scales)
+
+    def invalidate(self):
+        self._identity = None
+        self._identity_session = None
+
+    def _read_blocks(self, rtype, keys=None, delta=False):
+        results, keys = self._cached(rtype, keys)
+        self._request_failed = False
+
+        for block in self._plan(rtype, keys):
+            results.update(self._read_block(block, rtype, delta))
+
+        self._settle()
+        return results
+
+    def _read_lazy(self, rtype, keys=None, scaled=False):
+        results, keys = self._cached(rtype, keys)
+        results = LazyValues(results, self._scale_index() if scaled else None)
+        self._request_failed = False
+
+        for block in self._plan(rtype, keys):
+            payload = self._read_payload(block, rtype)
+
+            if payload:
+                results.add(block.decoder, payload)
+
+        self._settle()
+        return results
+
+    def read_all(self, rtype=registerType.HOLDING, scaled=False, lazy=False):
+        if lazy:
+            results = self._read_lazy(rtype, scaled=scaled)
+            self._cache(results)
+            return results
+
+        results = self._read_blocks(rtype)
+        self._cache(results)
+
+        if scaled:
+            return self._scaled(results)
+
+        return results
+
+    def read_many(self, keys, rtype=registerType.HOLDING, scaled=False, lazy=False):
+        if lazy:
+            return self._read_lazy(rtype, self._many(keys), scaled)
+
+        results = self._read_blocks(rtype, self._many(keys))
+
+        if scaled:
+            return self._scaled(results)
+
+        return results
+
+    def read_changes(self, keys=False, rtype=registerType.HOLDING, scaled=False):
+        if keys:
+            results = self._read_blocks(rtype, self._many(keys), delta=True)
+        else:
+            results = self._read_blocks(rtype, delta=True)
+            self._cache(results)
+
+        if scaled:
+            self._scaled(results)
+
+        return self.delta.changes(results)
+
+    def stream(self, interval, keys=False, scaled=False):
+        deadline = time.monotonic()
+
+        while True:
+            if keys:
+                values = self.read_many(keys, scaled=scaled)
+            else:
+                values = self.read_all(scaled=scaled)
+
+            yield time.time(), values
+
+            deadline, delay = next_tick(deadline, interval)
+            time.sleep(delay)
+
 
 class Inverter(SolarEdge):
 
-    def __init__(self, *args, **kwargs):
+    # Registers that require a different wordorder
+    little_endian_registers = frozenset({
+        0xf700,  # export_control_mode
+        0xf701,  # export_control_limit_mode
+        0xf702,  # export_control_site_limit
+        0xe004,  # storage_control_mode
+        0xe005,  # storage_ac_charge_policy
+        0xe006,  # storage_ac_charge_limit
+        0xe008,  # storage_backup_reserved_setting
+        0xe00a,  # storage_default_mode
+        0xe00B,  # rc_cmd_timeout
+        0xe00d,  # rc_cmd_mode
+        0xe00e,  # rc_charge_limit
+        0xe010   # rc_discharge_limit
+    })
+
+    meter_dids = [
+        Register(0x9cfc, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1),
+        Register(0x9daa, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1),
+        Register(0x9e59, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1)
+    ]
+
+    battery_dids = [
+        Register(0xe140, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1),
+        Register(0xe240, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1)
+#        Register(0xe340, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1)
+    ]
+
+    def __init__(self, *args, discovery_interval=False, **kwargs):
         self.model = "Inverter"
-        self.wordorder = Endian.BIG
+        self.discovery_interval = discovery_interval
+        self.topology = None
 
         super().__init__(*args, **kwargs)
 
-        # A dictionary to hold registers that require different wordorder
-        self.little_endian_registers = {
-            0xf700,  # export_control_mode
-            0xf701,  # export_control_limit_mode
-            0xf702,  # export_control_site_limit
-            0xe004,  # storage_control_mode
-            0xe005,  # storage_ac_charge_policy
-            0xe006,  # storage_ac_charge_limit
-            0xe008,  # storage_backup_reserved_setting
-            0xe00a,  # storage_default_mode
-            0xe00B,  # rc_cmd_timeout
-            0xe00d,  # rc_cmd_mode
-            0xe00e,  # rc_charge_limit
-            0xe010   # rc_discharge_limit
-        }
+        self.registers = self._register_table()
 
-        self.registers = {
+    @classmethod
+    def _register_map(cls, offset):
+        return {
             # name, address, length, register, type, target type, description, unit, batch
             "c_id": (0x9c40, 2, registerType.HOLDING, registerDataType.STRING, str, "SunSpec ID", "", 1),
             "c_did": (0x9c42, 1, registerType.HOLDING, registerDataType.UINT16, int, "SunSpec DID", "", 1),
@@ -568,138 +1343,196 @@ class Inverter(SolarEdge):
 
         }
 
-        self.meter_dids = [
-            (0x9cfc, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1),
-            (0x9daa, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1),
-            (0x9e59, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1)
-        ]
+    def _probes(self):
+        probes = {}
+        probes.update({("meter", idx): v for idx, v in enumerate(self.meter_dids)})
+        probes.update({("battery", idx): v for idx, v in enumerate(self.battery_dids)})
 
-        self.battery_dids = [
-            (0xe140, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1),
-            (0xe240, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1)
-#            (0xe340, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1)
-        ]
+        plan_key = (self._index_key(), "discovery")
+        plan = SolarEdge._plans.get(plan_key)
 
-    def meters(self):
-        meters = [self._read(v) for v in self.meter_dids]
+        if plan is None:
+            plan = SolarEdge._plans.put(plan_key, [self._block(values) for values in self._build_plan(probes)])
 
-        return {f"Meter{idx + 1}": Meter(offset=idx, parent=self) for idx, v in enumerate(meters) if v}
+        return plan
 
-    def batteries(self):
-        batteries = [self._read(v) for v in self.battery_dids]
+    def _discovered(self, results, meter_class, battery_class):
+        # A probe the inverter answered with a Modbus exception, such as an
+        # illegal address, means the device is not there
+        meters = {
+            f"Meter{idx + 1}": meter_class(offset=idx, parent=self)
+            for idx in range(len(self.meter_dids))
+            if results.get(("meter", idx), False)
+        }
+        batteries = {
+            f"Battery{idx + 1}": battery_class(offset=idx, parent=self)
+            for idx in range(len(self.battery_dids))
+            if results.get(("battery", idx), 255) != 255
+        }
+
+        return Topology(meters, batteries, self._session())
+
+    def _discovery_due(self, refresh):
+        return (
+            refresh
+            or self.topology is None
+            or self.topology.session is not self._session()
+            or (self.discovery_interval and (time.monotonic() - self.topology.timestamp) > self.discovery_interval)
+        )
+
+    def _incomplete(self, topology):
+        # A topology from probes that failed to reach the inverter is not
+        # cached, or a glitch would be remembered as a missing meter or
+        # battery. The previous topology is kept instead.
+        if self.topology is not None:
+            return self.topology
+
+        return topology
+
+    def discover(self, refresh=False):
+        if self._discovery_due(refresh):
+            results = {}
+            self._request_failed = False
+
+            for block in self._probes():
+                results.update(self._read_block(block, registerType.HOLDING))
+
+            complete = not self._request_failed
+            self._settle()
+
+            topology = self._discovered(results, Meter, Battery)
+
+            if not complete:
+                return self._incomplete(topology)
 
-        return {f"Battery{idx + 1}": Battery(offset=idx, parent=self) for idx, v in enumerate(batteries) if v != 255}
+            self.topology = topology
+
+        return self.topology
+
+    def meters(self):
+        return dict(self.discover().meters)
+
+    def batteries(self):
+        return dict(self.discover().batteries)
 
 class Meter(SolarEdge):
 
     def __init__(self, offset=False, *args, **kwargs):
         self.model = f"Meter{offset + 1}"
-        self.wordorder = Endian.BIG
 
         super().__init__(*args, **kwargs)
 
         self.offset = METER_REGISTER_OFFSETS[offset]
-        self.registers = {
-            "c_manufacturer": (0x9cbb + self.offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Manufacturer", "", 1),
-            "c_model": (0x9ccb + self.offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Model", "", 1),
-            "c_option": (0x9cdb + self.offset, 8, registerType.HOLDING, registerDataType.STRING, str, "Mode", "", 1),
-            "c_version": (0x9ce3 + self.offset, 8, registerType.HOLDING, registerDataType.STRING, str, "Version", "", 1),
-            "c_serialnumber": (0x9ceb + self.offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Serial", "", 1),
-            "c_deviceaddress": (0x9cfb + self.offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "Modbus ID", "", 1),
-            "c_sunspec_did": (0x9cfc + self.offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "SunSpec DID", C_SUNSPEC_DID_MAP, 2),
-            "c_sunspec_length": (0x9cfd + self.offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "SunSpec Length", "16Bit Words", 2),
-
-            "current": (0x9cfe + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Current", "A", 2),
-            "l1_current": (0x9cff + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Current", "A", 2),
-            "l2_current": (0x9d00 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Current", "A", 2),
-            "l3_current": (0x9d01 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Current", "A", 2),
-            "current_scale": (0x9d02 + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Current Scale Factor", "", 2),
-
-            "voltage_ln": (0x9d03 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L-N Voltage", "V", 2),
-            "l1n_voltage": (0x9d04 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1-N Voltage", "V", 2),
-            "l2n_voltage": (0x9d05 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2-N Voltage", "V", 2),
-            "l3n_voltage": (0x9d06 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3-N Voltage", "V", 2),
-            "voltage_ll": (0x9d07 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L-L Voltage", "V", 2),
-            "l12_voltage": (0x9d08 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1-l2 Voltage", "V", 2),
-            "l23_voltage": (0x9d09 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2-l3 Voltage", "V", 2),
-            "l31_voltage": (0x9d0a + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3-l1 Voltage", "V", 2),
-            "voltage_scale": (0x9d0b + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Voltage Scale Factor", "", 2),
-
-            "frequency": (0x9d0c + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Frequency", "Hz", 2),
-            "frequency_scale": (0x9d0d + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Frequency Scale Factor", "", 2),
-
-            "power": (0x9d0e + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Power", "W", 2),
-            "l1_power": (0x9d0f + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Power", "W", 2),
-            "l2_power": (0x9d10 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Power", "W", 2),
-            "l3_power": (0x9d11 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Power", "W", 2),
-            "power_scale": (0x9d12 + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Power Scale Factor", "", 2),
-
-            "power_apparent": (0x9d13 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Power (Apparent)", "VA", 2),
-            "l1_power_apparent": (0x9d14 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Power (Apparent)", "VA", 2),
-            "l2_power_apparent": (0x9d15 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Power (Apparent)", "VA", 2),
-            "l3_power_apparent": (0x9d16 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Power (Apparent)", "VA", 2),
-            "power_apparent_scale": (0x9d17 + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Power (Apparent) Scale Factor", "", 2),
-
-            "power_reactive": (0x9d18 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Power (Reactive)", "VAr", 2),
-            "l1_power_reactive": (0x9d19 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Power (Reactive)", "VAr", 2),
-            "l2_power_reactive": (0x9d1a + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Power (Reactive)", "VAr", 2),
-            "l3_power_reactive": (0x9d1b + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Power (Reactive)", "VAr", 2),
-            "power_reactive_scale": (0x9d1c + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Power (Reactive) Scale Factor", "", 2),
-
-            "power_factor": (0x9d1d + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Power Factor", "", 2),
-            "l1_power_factor": (0x9d1e + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Power Factor", "", 2),
-            "l2_power_factor": (0x9d1f + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Power Factor", "", 2),
-            "l3_power_factor": (0x9d20 + self.offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Power Factor", "", 2),
-            "power_factor_scale": (0x9d21 + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Power Factor Scale Factor", "", 2),
-
-            "export_energy_active": (0x9d22 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Exported Energy (Active)", "Wh", 2),
-            "l1_export_energy_active": (0x9d24 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Exported Energy (Active)", "Wh", 2),
-            "l2_export_energy_active": (0x9d26 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Exported Energy (Active)", "Wh", 2),
-            "l3_export_energy_active": (0x9d28 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Exported Energy (Active)", "Wh", 2),
-            "import_energy_active": (0x9d2a + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Imported Energy (Active)", "Wh", 2),
-            "l1_import_energy_active": (0x9d2c + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Imported Energy (Active)", "Wh", 2),
-            "l2_import_energy_active": (0x9d2e + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Imported Energy (Active)", "Wh", 2),
-            "l3_import_energy_active": (0x9d30 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Imported Energy (Active)", "Wh", 2),
-            "energy_active_scale": (0x9d32 + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Energy (Active) Scale Factor", "", 2),
-
-            "export_energy_apparent": (0x9d33 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Exported Energy (Apparent)", "VAh", 3),
-            "l1_export_energy_apparent": (0x9d35 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Exported Energy (Apparent)", "VAh", 3),
-            "l2_export_energy_apparent": (0x9d37 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Exported Energy (Apparent)", "VAh", 3),
-            "l3_export_energy_apparent": (0x9d39 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Exported Energy (Apparent)", "VAh", 3),
-            "import_energy_apparent": (0x9d3b + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Imported Energy (Apparent)", "VAh", 3),
-            "l1_import_energy_apparent": (0x9d3d + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Imported Energy (Apparent)", "VAh", 3),
-            "l2_import_energy_apparent": (0x9d3f + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Imported Energy (Apparent)", "VAh", 3),
-            "l3_import_energy_apparent": (0x9d41 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Imported Energy (Apparent)", "VAh", 3),
-            "energy_apparent_scale": (0x9d43 + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Energy (Apparent) Scale Factor", "", 3),
-
-            "import_energy_reactive_q1": (0x9d44 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Imported Energy (Reactive) Quadrant 1", "VArh", 3),
-            "l1_import_energy_reactive_q1": (0x9d46 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Imported Energy (Reactive) Quadrant 1", "VArh", 3),
-            "l2_import_energy_reactive_q1": (0x9d48 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Imported Energy (Reactive) Quadrant 1", "VArh", 3),
-            "l3_import_energy_reactive_q1": (0x9d4a + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Imported Energy (Reactive) Quadrant 1", "VArh", 3),
-            "import_energy_reactive_q2": (0x9d4c + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Imported Energy (Reactive) Quadrant 2", "VArh", 3),
-            "l1_import_energy_reactive_q2": (0x9d4e + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Imported Energy (Reactive) Quadrant 2", "VArh", 3),
-            "l2_import_energy_reactive_q2": (0x9d50 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Imported Energy (Reactive) Quadrant 2", "VArh", 3),
-            "l3_import_energy_reactive_q2": (0x9d52 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Imported Energy (Reactive) Quadrant 2", "VArh", 3),
-            "export_energy_reactive_q3": (0x9d54 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Exported Energy (Reactive) Quadrant 3", "VArh", 3),
-            "l1_export_energy_reactive_q3": (0x9d56 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Exported Energy (Reactive) Quadrant 3", "VArh", 3),
-            "l2_export_energy_reactive_q3": (0x9d58 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Exported Energy (Reactive) Quadrant 3", "VArh", 3),
-            "l3_export_energy_reactive_q3": (0x9d5a + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Exported Energy (Reactive) Quadrant 3", "VArh", 3),
-            "export_energy_reactive_q4": (0x9d5c + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Exported Energy (Reactive) Quadrant 4", "VArh", 3),
-            "l1_export_energy_reactive_q4": (0x9d5e + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Exported Energy (Reactive) Quadrant 4", "VArh", 3),
-            "l2_export_energy_reactive_q4": (0x9d60 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Exported Energy (Reactive) Quadrant 4", "VArh", 3),
-            "l3_export_energy_reactive_q4": (0x9d62 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Exported Energy (Reactive) Quadrant 4", "VArh", 3),
-            "energy_reactive_scale": (0x9d64 + self.offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Energy (Reactive) Scale Factor", "", 3)
+        self.registers = self._register_table(self.offset)
+
+    @classmethod
+    def _register_map(cls, offset):
+        return {
+            "c_manufacturer": (0x9cbb + offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Manufacturer", "", 1),
+            "c_model": (0x9ccb + offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Model", "", 1),
+            "c_option": (0x9cdb + offset, 8, registerType.HOLDING, registerDataType.STRING, str, "Mode", "", 1),
+            "c_version": (0x9ce3 + offset, 8, registerType.HOLDING, registerDataType.STRING, str, "Version", "", 1),
+            "c_serialnumber": (0x9ceb + offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Serial", "", 1),
+            "c_deviceaddress": (0x9cfb + offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "Modbus ID", "", 1),
+            "c_sunspec_did": (0x9cfc + offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "SunSpec DID", C_SUNSPEC_DID_MAP, 2),
+            "c_sunspec_length": (0x9cfd + offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "SunSpec Length", "16Bit Words", 2),
+
+            "current": (0x9cfe + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Current", "A", 2),
+            "l1_current": (0x9cff + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Current", "A", 2),
+            "l2_current": (0x9d00 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Current", "A", 2),
+            "l3_current": (0x9d01 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Current", "A", 2),
+            "current_scale": (0x9d02 + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Current Scale Factor", "", 2),
+
+            "voltage_ln": (0x9d03 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L-N Voltage", "V", 2),
+            "l1n_voltage": (0x9d04 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1-N Voltage", "V", 2),
+            "l2n_voltage": (0x9d05 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2-N Voltage", "V", 2),
+            "l3n_voltage": (0x9d06 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3-N Voltage", "V", 2),
+            "voltage_ll": (0x9d07 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L-L Voltage", "V", 2),
+            "l12_voltage": (0x9d08 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1-l2 Voltage", "V", 2),
+            "l23_voltage": (0x9d09 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2-l3 Voltage", "V", 2),
+            "l31_voltage": (0x9d0a + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3-l1 Voltage", "V", 2),
+            "voltage_scale": (0x9d0b + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Voltage Scale Factor", "", 2),
+
+            "frequency": (0x9d0c + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Frequency", "Hz", 2),
+            "frequency_scale": (0x9d0d + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Frequency Scale Factor", "", 2),
+
+            "power": (0x9d0e + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Power", "W", 2),
+            "l1_power": (0x9d0f + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Power", "W", 2),
+            "l2_power": (0x9d10 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Power", "W", 2),
+            "l3_power": (0x9d11 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Power", "W", 2),
+            "power_scale": (0x9d12 + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Power Scale Factor", "", 2),
+
+            "power_apparent": (0x9d13 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Power (Apparent)", "VA", 2),
+            "l1_power_apparent": (0x9d14 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Power (Apparent)", "VA", 2),
+            "l2_power_apparent": (0x9d15 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Power (Apparent)", "VA", 2),
+            "l3_power_apparent": (0x9d16 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Power (Apparent)", "VA", 2),
+            "power_apparent_scale": (0x9d17 + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Power (Apparent) Scale Factor", "", 2),
+
+            "power_reactive": (0x9d18 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Power (Reactive)", "VAr", 2),
+            "l1_power_reactive": (0x9d19 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Power (Reactive)", "VAr", 2),
+            "l2_power_reactive": (0x9d1a + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Power (Reactive)", "VAr", 2),
+            "l3_power_reactive": (0x9d1b + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Power (Reactive)", "VAr", 2),
+            "power_reactive_scale": (0x9d1c + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Power (Reactive) Scale Factor", "", 2),
+
+            "power_factor": (0x9d1d + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "Power Factor", "", 2),
+            "l1_power_factor": (0x9d1e + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L1 Power Factor", "", 2),
+            "l2_power_factor": (0x9d1f + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L2 Power Factor", "", 2),
+            "l3_power_factor": (0x9d20 + offset, 1, registerType.HOLDING, registerDataType.INT16, int, "L3 Power Factor", "", 2),
+            "power_factor_scale": (0x9d21 + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Power Factor Scale Factor", "", 2),
+
+            "export_energy_active": (0x9d22 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Exported Energy (Active)", "Wh", 2),
+            "l1_export_energy_active": (0x9d24 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Exported Energy (Active)", "Wh", 2),
+            "l2_export_energy_active": (0x9d26 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Exported Energy (Active)", "Wh", 2),
+            "l3_export_energy_active": (0x9d28 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Exported Energy (Active)", "Wh", 2),
+            "import_energy_active": (0x9d2a + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Imported Energy (Active)", "Wh", 2),
+            "l1_import_energy_active": (0x9d2c + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Imported Energy (Active)", "Wh", 2),
+            "l2_import_energy_active": (0x9d2e + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Imported Energy (Active)", "Wh", 2),
+            "l3_import_energy_active": (0x9d30 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Imported Energy (Active)", "Wh", 2),
+            "energy_active_scale": (0x9d32 + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Energy (Active) Scale Factor", "", 2),
+
+            "export_energy_apparent": (0x9d33 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Exported Energy (Apparent)", "VAh", 3),
+            "l1_export_energy_apparent": (0x9d35 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Exported Energy (Apparent)", "VAh", 3),
+            "l2_export_energy_apparent": (0x9d37 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Exported Energy (Apparent)", "VAh", 3),
+            "l3_export_energy_apparent": (0x9d39 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Exported Energy (Apparent)", "VAh", 3),
+            "import_energy_apparent": (0x9d3b + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Imported Energy (Apparent)", "VAh", 3),
+            "l1_import_energy_apparent": (0x9d3d + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Imported Energy (Apparent)", "VAh", 3),
+            "l2_import_energy_apparent": (0x9d3f + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Imported Energy (Apparent)", "VAh", 3),
+            "l3_import_energy_apparent": (0x9d41 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Imported Energy (Apparent)", "VAh", 3),
+            "energy_apparent_scale": (0x9d43 + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Energy (Apparent) Scale Factor", "", 3),
+
+            "import_energy_reactive_q1": (0x9d44 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Imported Energy (Reactive) Quadrant 1", "VArh", 3),
+            "l1_import_energy_reactive_q1": (0x9d46 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Imported Energy (Reactive) Quadrant 1", "VArh", 3),
+            "l2_import_energy_reactive_q1": (0x9d48 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Imported Energy (Reactive) Quadrant 1", "VArh", 3),
+            "l3_import_energy_reactive_q1": (0x9d4a + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Imported Energy (Reactive) Quadrant 1", "VArh", 3),
+            "import_energy_reactive_q2": (0x9d4c + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Imported Energy (Reactive) Quadrant 2", "VArh", 3),
+            "l1_import_energy_reactive_q2": (0x9d4e + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Imported Energy (Reactive) Quadrant 2", "VArh", 3),
+            "l2_import_energy_reactive_q2": (0x9d50 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Imported Energy (Reactive) Quadrant 2", "VArh", 3),
+            "l3_import_energy_reactive_q2": (0x9d52 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Imported Energy (Reactive) Quadrant 2", "VArh", 3),
+            "export_energy_reactive_q3": (0x9d54 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Exported Energy (Reactive) Quadrant 3", "VArh", 3),
+            "l1_export_energy_reactive_q3": (0x9d56 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Exported Energy (Reactive) Quadrant 3", "VArh", 3),
+            "l2_export_energy_reactive_q3": (0x9d58 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Exported Energy (Reactive) Quadrant 3", "VArh", 3),
+            "l3_export_energy_reactive_q3": (0x9d5a + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Exported Energy (Reactive) Quadrant 3", "VArh", 3),
+            "export_energy_reactive_q4": (0x9d5c + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Total Exported Energy (Reactive) Quadrant 4", "VArh", 3),
+            "l1_export_energy_reactive_q4": (0x9d5e + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L1 Exported Energy (Reactive) Quadrant 4", "VArh", 3),
+            "l2_export_energy_reactive_q4": (0x9d60 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L2 Exported Energy (Reactive) Quadrant 4", "VArh", 3),
+            "l3_export_energy_reactive_q4": (0x9d62 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "L3 Exported Energy (Reactive) Quadrant 4", "VArh", 3),
+            "energy_reactive_scale": (0x9d64 + offset, 1, registerType.HOLDING, registerDataType.SCALE, int, "Energy (Reactive) Scale Factor", "", 3)
         }
 
 class StorEdge(SolarEdge):
+
+    wordorder = Endian.LITTLE
     
     def __init__(self, *args, **kwargs):
         self.model = "StorEdge"
-        self.wordorder = Endian.LITTLE
 
         super().__init__(*args, **kwargs)
 
-        self.registers = {
+        self.registers = self._register_table()
+
+    @classmethod
+    def _register_map(cls, offset):
+        return {
             "export_control_mode": (0xe000, 1, registerType.HOLDING, registerDataType.UINT16, int, "Export Control Mode", EXPORT_CONTROL_MODE_MAP, 1),
             "export_control_limit_mode": (0xe001, 1, registerType.HOLDING, registerDataType.UINT16, int, "Export Control Limit Mode", EXPORT_CONTROL_LIMIT_MAP, 1),
             "export_control_site_limit": (0xe002, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Export Control Site Limit", "", 1),
@@ -718,46 +1551,371 @@ class StorEdge(SolarEdge):
 
 class Battery(SolarEdge):
 
+    wordorder = Endian.LITTLE
+
     def __init__(self, offset=False, *args, **kwargs):
         self.model = f"Battery{offset + 1}"
-        self.wordorder = Endian.LITTLE
 
         super().__init__(*args, **kwargs)
 
         self.offset = BATTERY_REGISTER_OFFSETS[offset]
-        self.registers = {
-            "c_manufacturer": (0xe100 + self.offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Manufacturer", "", 1),
-            "c_model": (0xe110 + self.offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Model", "", 1),
-            "c_version": (0xe120 + self.offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Version", "", 1),
-            "c_serialnumber": (0xe130 + self.offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Serial", "", 1),
-            "c_deviceaddress": (0xe140 + self.offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "Modbus ID", "", 1),
-            "c_sunspec_did": (0xe141 + self.offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "SunSpec DID", "", 1),
+        self.registers = self._register_table(self.offset)
+
+    @classmethod
+    def _register_map(cls, offset):
+        return {
+            "c_manufacturer": (0xe100 + offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Manufacturer", "", 1),
+            "c_model": (0xe110 + offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Model", "", 1),
+            "c_version": (0xe120 + offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Version", "", 1),
+            "c_serialnumber": (0xe130 + offset, 16, registerType.HOLDING, registerDataType.STRING, str, "Serial", "", 1),
+            "c_deviceaddress": (0xe140 + offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "Modbus ID", "", 1),
+            "c_sunspec_did": (0xe141 + offset, 1, registerType.HOLDING, registerDataType.UINT16, int, "SunSpec DID", "", 1),
 
-            "rated_energy": (0xe142 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Rated Energy", "Wh", 2),
-            "maximum_charge_continuous_power": (0xe144 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Charge Continuous Power", "W", 2),
-            "maximum_discharge_continuous_power": (0xe146 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Discharge Continuous Power", "W", 2),
-            "maximum_charge_peak_power": (0xe148 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Charge Peak Power", "W", 2),
-            "maximum_discharge_peak_power": (0xe14a + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Discharge Peak Power", "W", 2),
+            "rated_energy": (0xe142 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Rated Energy", "Wh", 2),
+            "maximum_charge_continuous_power": (0xe144 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Charge Continuous Power", "W", 2),
+            "maximum_discharge_continuous_power": (0xe146 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Discharge Continuous Power", "W", 2),
+            "maximum_charge_peak_power": (0xe148 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Charge Peak Power", "W", 2),
+            "maximum_discharge_peak_power": (0xe14a + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Discharge Peak Power", "W", 2),
 
-            "average_temperature": (0xe16c + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Average Temperature", "°C", 2),
-            "maximum_temperature": (0xe16e + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Temperature", "°C", 2),
+            "average_temperature": (0xe16c + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Average Temperature", "°C", 2),
+            "maximum_temperature": (0xe16e + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Temperature", "°C", 2),
 
-            "instantaneous_voltage": (0xe170 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Instantaneous Voltage", "V", 2),
-            "instantaneous_current": (0xe172 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Instantaneous Current", "A", 2),
-            "instantaneous_power": (0xe174 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Instantaneous Power", "W", 2),
+            "instantaneous_voltage": (0xe170 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Instantaneous Voltage", "V", 2),
+            "instantaneous_current": (0xe172 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Instantaneous Current", "A", 2),
+            "instantaneous_power": (0xe174 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Instantaneous Power", "W", 2),
 
-            "lifetime_export_energy_counter": (0xe176 + self.offset, 4, registerType.HOLDING, registerDataType.UINT64, int, "Total Exported Energy", "Wh", 2),
-            "lifetime_import_energy_counter": (0xe17A + self.offset, 4, registerType.HOLDING, registerDataType.UINT64, int, "Total Imported Energy", "Wh", 2),
+            "lifetime_export_energy_counter": (0xe176 + offset, 4, registerType.HOLDING, registerDataType.UINT64, int, "Total Exported Energy", "Wh", 2),
+            "lifetime_import_energy_counter": (0xe17A + offset, 4, registerType.HOLDING, registerDataType.UINT64, int, "Total Imported Energy", "Wh", 2),
 
-            "maximum_energy": (0xe17e + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Energy", "Wh", 2),
-            "available_energy": (0xe180 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Available Energy", "Wh", 2),
+            "maximum_energy": (0xe17e + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Maximum Energy", "Wh", 2),
+            "available_energy": (0xe180 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "Available Energy", "Wh", 2),
 
-            "soh": (0xe182 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "State of Health (SOH)", "%", 2),
-            "soe": (0xe184 + self.offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "State of Energy (SOE)", "%", 2),
+            "soh": (0xe182 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "State of Health (SOH)", "%", 2),
+            "soe": (0xe184 + offset, 2, registerType.HOLDING, registerDataType.SEFLOAT, float, "State of Energy (SOE)", "%", 2),
 
-            "status": (0xe186 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Status", BATTERY_STATUS_MAP, 2),
-            "status_internal": (0xe188 + self.offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Internal Status", BATTERY_STATUS_MAP, 2),
+            "status": (0xe186 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Status", BATTERY_STATUS_MAP, 2),
+            "status_internal": (0xe188 + offset, 2, registerType.HOLDING, registerDataType.UINT32, int, "Internal Status", BATTERY_STATUS_MAP, 2),
 
-            "event_log": (0xe18a + self.offset, 2, registerType.HOLDING, registerDataType.UINT16, int, "Event Log", "", 2),
-            "event_log_internal": (0xe192 + self.offset, 2, registerType.HOLDING, registerDataType.UINT16, int, "Internal Event Log", "", 2),
+            "event_log": (0xe18a + offset, 2, registerType.HOLDING, registerDataType.UINT16, int, "Event Log", "", 2),
+            "event_log_internal": (0xe192 + offset, 2, registerType.HOLDING, registerDataType.UINT16, int, "Internal Event Log", "", 2),
         }
+
+
+class AsyncSolarEdge(SolarEdge):
+
+    def _acquire_client(self):
+        return self._create_client()
+
+    def _retain_client(self, client):
+        return client
+
+    def _create_client(self):
+        if self.mode is connectionType.RTU:
+            client = AsyncModbusSerialClient(
+                port=self.device,
+                stopbits=self.stopbits,
+                parity=self.parity,
+                baudrate=self.baud,
+                timeout=self.timeout)
+        else:
+            client = AsyncModbusTcpClient(
+                host=self.host,
+                port=self.port,
+                timeout=self.timeout
+            )
+
+        client.register(ReadHoldingBlockResponse)
+        return client
+
+    async def _read_holding_block(self, address, length):
+        # Fail fast while the device is known to be unreachable, or once a
+        # request of the same read has failed
+        if self._request_failed or not self.breaker.allow():
+            return None
+
+        metrics = self.metrics
+
+        for i in range(self.retries):
+            if i:
+                if metrics:
+                    metrics.retry(self)
+
+                await asyncio.sleep(self.retry_policy.delay(i - 1))
+
+            if not self.connected():
+                connected = await self.connect()
+
+                if metrics:
+                    metrics.connect(self, connected)
+                if not connected:
+                    continue
+
+            start = time.perf_counter() if metrics else 0
+
+            try:
+                result = await self.client.read_holding_registers(address, length, slave=self.unit)
+            except ModbusException:
+                result = None
+
+            ok = isinstance(result, ReadHoldingBlockResponse) and len(result.payload) == (length * 2)
+
+            if metrics:
+                metrics.request(self, READ_HOLDING_REGISTERS, address, length, time.perf_counter() - start, ok)
+
+            # The device answered with a Modbus exception, so it is reachable
+            # and asking again will not change its answer
+            if isinstance(result, ExceptionResponse):
+                self.breaker.success()
+                return None
+            if not ok:
+                continue
+
+            if self.capture:
+                self.capture.record(self, address, result.payload)
+
+            self.breaker.success()
+            return result.payload
+
+        self._request_failed = True
+        return None
+
+    async def _read_holding_registers(self, address, length):
+        # Check if the register needs little endian
+        wordorder = Endian.LITTLE if address in self.little_endian_registers else self.wordorder
+        payload = await self._read_holding_block(address, length)
+
+        if payload is None:
+            return None
+
+        return BinaryPayloadDecoder(bytes(payload), byteorder=Endian.BIG, wordorder=wordorder)
+
+    async def _write_holding_register(self, address, value, dtype):
+        # Determine byte order based on address
+        wordorder = Endian.LITTLE if address in self.little_endian_registers else self.wordorder
+
+        # Use dtype and wordorder to encode the value properly
+        encoded_value = self._encode_value(value, dtype, wordorder)
+
+        return await self._write_holding_block(address, encoded_value)
+
+    async def _write_holding_block(self, address, registers):
+        if not self.metrics:
+            return await self.client.write_registers(address=address, values=registers, slave=self.unit)
+
+        start = time.perf_counter()
+        result = await self.client.write_registers(address=address, values=registers, slave=self.unit)
+        self.metrics.request(self, WRITE_MULTIPLE_REGISTERS, address, len(registers), time.perf_counter() - start, not result.isError())
+
+        return result
+
+    async def _read(self, value, scale=False):
+        address, length, rtype, dtype, vtype, label, fmt, batch = value
+        try:
+            if rtype == registerType.INPUT:
+                return self._decode_value(await self._read_input_registers(address, length), length, dtype, vtype, scale)
+            elif rtype == registerType.HOLDING:
+                return self._decode_value(await self._read_holding_registers(address, length), length, dtype, vtype, scale)
+            else:
+                raise NotImplementedError(rtype)
+        except NotImplementedError:
+            raise
+        except AttributeError:
+            return False
+
+    async def _read_payload(self, block, rtype):
+        if rtype == registerType.INPUT:
+            return await self._read_input_block(block.offset, block.length)
+        elif rtype == registerType.HOLDING:
+            return await self._read_holding_block(block.offset, block.length)
+        else:
+            raise NotImplementedError(rtype)
+
+    async def _read_block(self, block, rtype, delta=False):
+        try:
+            data = await self._read_payload(block, rtype)
+
+            if not data:
+                return {}
+
+            start = time.perf_counter() if self.metrics else 0
+
+            if delta:
+                decoded = self.delta.decode(block, data, block.decoder)
+            else:
+                decoded = block.decoder.decode_payload(data)
+
+            if self.metrics:
+                self.metrics.decode(self, block.offset, block.length, time.perf_counter() - start)
+
+            return decoded
+        except NotImplementedError:
+            raise
+
+    async def _read_all(self, values, rtype, delta=False):
+        return await self._read_block(self._block(values), rtype, delta)
+
+    async def _write(self, value, data):
+        address, length, rtype, dtype, vtype, label, fmt, batch = value
+        try:
+            if rtype == registerType.HOLDING:
+                return await self._write_holding_register(address, data, dtype)
+            else:
+                raise NotImplementedError(rtype)
+        except NotImplementedError:
+            raise
+
+    def _session(self):
+        return self.client.transport
+
+    async def connect(self):
+        return await self.client.connect()
+
+    def disconnect(self):
+        self.client.close()
+
+    def connected(self):
+        return self.client.connected
+
+    async def read(self, key):
+        if key not in self.registers:
+            raise KeyError(key)
+
+        self._request_failed = False
+        value = await self._read(self.registers[key], key.endswith("_scale"))
+        self._settle()
+
+        return {key: value}
+
+    async def write(self, key, data):
+        if key not in self.registers:
+            raise KeyError(key)
+
+        return await self._write(self.registers[key], data)
+
+    async def write_many(self, values, commit=False):
+        results = []
+
+        for address, registers in self._write_plan(values, commit):
+            result = await self._write_holding_block(address, registers)
+            results.append(result)
+
+            if result.isError():
+                break
+
+        return results
+
+    async def _read_blocks(self, rtype, keys=None, delta=False):
+        results, keys = self._cached(rtype, keys)
+        self._request_failed = False
+
+        for block in self._plan(rtype, keys):
+            results.update(await self._read_block(block, rtype, delta))
+
+        self._settle()
+        return results
+
+    async def _read_lazy(self, rtype, keys=None, scaled=False):
+        results, keys = self._cached(rtype, keys)
+        results = LazyValues(results, self._scale_index() if scaled else None)
+        self._request_failed = False
+
+        for block in self._plan(rtype, keys):
+            payload = await self._read_payload(block, rtype)
+
+            if payload:
+                results.add(block.decoder, payload)
+
+        self._settle()
+        return results
+
+    async def read_all(self, rtype=registerType.HOLDING, scaled=False, lazy=False):
+        if lazy:
+            results = await self._read_lazy(rtype, scaled=scaled)
+            self._cache(results)
+            return results
+
+        results = await self._read_blocks(rtype)
+        self._cache(results)
+
+        if scaled:
+            return self._scaled(results)
+
+        return results
+
+    async def read_many(self, keys, rtype=registerType.HOLDING, scaled=False, lazy=False):
+        if lazy:
+            return await self._read_lazy(rtype, self._many(keys), scaled)
+
+        results = await self._read_blocks(rtype, self._many(keys))
+
+        if scaled:
+            return self._scaled(results)
+
+        return results
+
+    async def read_changes(self, keys=False, rtype=registerType.HOLDING, scaled=False):
+        if keys:
+            results = await self._read_blocks(rtype, self._many(keys), delta=True)
+        else:
+            results = await self._read_blocks(rtype, delta=True)
+            self._cache(results)
+
+        if scaled:
+            self._scaled(results)
+
+        return self.delta.changes(results)
+
+    async def stream(self, interval, keys=False, scaled=False):
+        deadline = time.monotonic()
+
+        while True:
+            if keys:
+                values = await self.read_many(keys, scaled=scaled)
+            else:
+                values = await self.read_all(scaled=scaled)
+
+            yield time.time(), values
+
+            deadline, delay = next_tick(deadline, interval)
+            await asyncio.sleep(delay)
+
+
+class AsyncInverter(AsyncSolarEdge, Inverter):
+
+    async def discover(self, refresh=False):
+        if self._discovery_due(refresh):
+            results = {}
+            self._request_failed = False
+
+            for block in self._probes():
+                results.update(await self._read_block(block, registerType.HOLDING))
+
+            complete = not self._request_failed
+            self._settle()
+
+            topology = self._discovered(results, AsyncMeter, AsyncBattery)
+
+            if not complete:
+                return self._incomplete(topology)
+
+            self.topology = topology
+
+        return self.topology
+
+    async def meters(self):
+        return dict((await self.discover()).meters)
+
+    async def batteries(self):
+        return dict((await self.discover()).batteries)
+
+
+class AsyncMeter(AsyncSolarEdge, Meter):
+    pass
+
+
+class AsyncStorEdge(AsyncSolarEdge, StorEdge):
+    pass
+
+
+class AsyncBattery(AsyncSolarEdge, Battery):
+    pass
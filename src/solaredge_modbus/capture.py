@@ -0,0 +1,212 @@
+import array
+import bisect
+import heapq
+import mmap
+import os
+import struct
+import threading
+import time
+
+from . import BATTERY_REGISTER_OFFSETS
+from . import METER_REGISTER_OFFSETS
+from . import BlockDecoder
+from . import Battery
+from . import Inverter
+from . import Meter
+from . import StorEdge
+from . import registerType
+
+
+# A capture file is a header followed by records, each a record header and
+# the registers as big endian uint16, the way they are sent on the wire
+HEADER = struct.Struct(">4sBxxx")
+RECORD = struct.Struct(">dBBHH")
+MAGIC = b"SEMB"
+VERSION = 1
+
+# Device codes stored in records. Only ever append to this list.
+DEVICES = ["Inverter", "StorEdge", "Meter1", "Meter2", "Meter3", "Battery1", "Battery2"]
+UNKNOWN = 0xff
+
+
+def _scan(data):
+    # Yield the offset and header of every complete record, stopping at a
+    # record that was only partially written
+    position = HEADER.size
+
+    while position + RECORD.size <= len(data):
+        timestamp, device, unit, address, count = RECORD.unpack_from(data, position)
+        end = position + RECORD.size + count * 2
+
+        if end > len(data):
+            return
+
+        yield position, timestamp, device, unit, address, count
+        position = end
+
+
+def _check_header(data, path):
+    magic, version = HEADER.unpack_from(data)
+
+    if magic != MAGIC or version > VERSION:
+        raise ValueError(f"{path} is not a capture file")
+
+
+class Capture:
+
+    def __init__(self, path):
+        # Append to an existing capture, dropping a partially written record
+        # left behind by an interrupted write
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a+b")
+        self.file.seek(0)
+        data = self.file.read()
+
+        if not data:
+            self.file.write(HEADER.pack(MAGIC, VERSION))
+        else:
+            _check_header(data, path)
+            end = HEADER.size
+
+            for position, timestamp, device, unit, address, count in _scan(data):
+                end = position + RECORD.size + count * 2
+
+            if end < len(data):
+                self.file.truncate(end)
+
+    def __repr__(self):
+        return f"Capture({self.path})"
+
+    def record(self, device, address, payload):
+        # payload is the register data as received, big endian
+        code = DEVICES.index(device.model) if device.model in DEVICES else UNKNOWN
+        data = RECORD.pack(time.time(), code, device.unit, address, len(payload) // 2) + payload
+
+        with self.lock:
+            self.file.write(data)
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class Replay:
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+
+        if os.fstat(self.file.fileno()).st_size:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            _check_header(self.data, path)
+        else:
+            self.data = b""
+
+        self.decoders = {}
+        self._index()
+
+    def __repr__(self):
+        return f"Replay({self.path}, {len(self)} records)"
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        return self.records()
+
+    def _index(self):
+        # Index record offsets and timestamps, both overall and per device
+        # and unit, so time ranges can be found by bisection
+        self.offsets = array.array("Q")
+        self.timestamps = array.array("d")
+        self.index = {}
+
+        for position, timestamp, device, unit, address, count in _scan(self.data):
+            records, timestamps = self.index.setdefault((device, unit), (array.array("Q"), array.array("d")))
+            records.append(len(self.offsets))
+            timestamps.append(timestamp)
+            self.offsets.append(position)
+            self.timestamps.append(timestamp)
+
+    def _range(self, records, timestamps, start, end):
+        lo = bisect.bisect_left(timestamps, start) if start else 0
+        hi = bisect.bisect_right(timestamps, end) if end else len(records)
+
+        return records[lo:hi]
+
+    def records(self, start=False, end=False, device=False, unit=False):
+        # Yield (timestamp, device, unit, address, registers) in the order
+        # they were captured, optionally limited to a time range, a device
+        # model and a unit
+        if not device and not unit:
+            selected = [(range(len(self.offsets)), self.timestamps)]
+        else:
+            code = DEVICES.index(device) if device else None
+            selected = [
+                index for (d, u), index in self.index.items()
+                if (code is None or d == code) and (not unit or u == unit)
+            ]
+
+        for i in heapq.merge(*(self._range(records, timestamps, start, end) for records, timestamps in selected)):
+            position = self.offsets[i]
+            timestamp, code, record_unit, address, count = RECORD.unpack_from(self.data, position)
+            registers = struct.unpack_from(f">{count}H", self.data, position + RECORD.size)
+
+            yield timestamp, DEVICES[code] if code < len(DEVICES) else None, record_unit, address, registers
+
+    def _device(self, model):
+        # The device class and register offset of a captured model
+        if model == "Inverter":
+            return Inverter, 0
+        elif model == "StorEdge":
+            return StorEdge, 0
+        elif model.startswith("Meter"):
+            return Meter, METER_REGISTER_OFFSETS[int(model[5:]) - 1]
+        else:
+            return Battery, BATTERY_REGISTER_OFFSETS[int(model[7:]) - 1]
+
+    def _decoder(self, model, address, count):
+        # Decode a captured block with the current register map, using every
+        # register that lies entirely within it
+        key = (model, address, count)
+
+        if key not in self.decoders:
+            device, offset = self._device(model)
+            block = {
+                k: v for k, v in device._register_table(offset).items()
+                if v.rtype == registerType.HOLDING and v.address >= address and (v.address + v.length) <= (address + count)
+            }
+
+            self.decoders[key] = BlockDecoder(block, address, device._wordorder(address)) if block else None
+
+        return self.decoders[key]
+
+    def decode(self, start=False, end=False, device=False, unit=False, scaled=False):
+        # Yield (timestamp, device, unit, values) for every captured block
+        for timestamp, model, record_unit, address, registers in self.records(start, end, device, unit):
+            if model is None:
+                continue
+
+            decoder = self._decoder(model, address, len(registers))
+
+            if decoder is None:
+                continue
+
+            values = decoder.decode(registers[:decoder.length])
+
+            if scaled:
+                device, offset = self._device(model)
+                values = device._apply_scales(values, device._scale_table(offset))
+
+            yield timestamp, model, record_unit, values
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+        self.file.close()
@@ -0,0 +1,48 @@
+class Delta:
+
+    def __init__(self, deadbands=False):
+        # deadbands maps a key to an (absolute, relative) tuple. A value is
+        # only reported once it moves further than the larger of the two away
+        # from the last value reported for that key.
+        self.deadbands = dict(deadbands or {})
+        self.values = {}
+        self.blocks = {}
+
+    def __repr__(self):
+        return f"Delta({len(self.values)} values, {len(self.blocks)} blocks, deadbands={self.deadbands})"
+
+    def reset(self):
+        self.values = {}
+        self.blocks = {}
+
+    def decode(self, block, payload, decoder):
+        # Skip decoding a block whose raw register data did not change since
+        # the previous read, and reuse its previously decoded values instead.
+        # Only the last block read at an address is kept.
+        previous = self.blocks.get(block.offset)
+
+        if previous is not None and previous[0] is block and previous[1] == payload:
+            return previous[2]
+
+        decoded = decoder.decode_payload(payload)
+        self.blocks[block.offset] = (block, bytes(payload), decoded)
+
+        return decoded
+
+    def changed(self, key, value):
+        if key not in self.values:
+            return True
+
+        previous = self.values[key]
+
+        if key in self.deadbands and isinstance(value, (int, float)) and isinstance(previous, (int, float)):
+            absolute, relative = self.deadbands[key]
+            return abs(value - previous) > max(absolute, abs(previous) * relative)
+
+        return value != previous
+
+    def changes(self, values):
+        changes = {k: v for k, v in values.items() if self.changed(k, v)}
+        self.values.update(changes)
+
+        return changes
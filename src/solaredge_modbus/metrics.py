@@ -0,0 +1,162 @@
+import bisect
+import threading
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DECODE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+READ_HOLDING_REGISTERS = 3
+WRITE_MULTIPLE_REGISTERS = 16
+
+# Frame sizes in bytes, excluding register data, of a request and its
+# response: MBAP header and PDU over TCP, address, PDU and CRC over RTU
+FRAME_BYTES = {
+    ("TCP", READ_HOLDING_REGISTERS): (12, 9),
+    ("TCP", WRITE_MULTIPLE_REGISTERS): (13, 12),
+    ("RTU", READ_HOLDING_REGISTERS): (8, 5),
+    ("RTU", WRITE_MULTIPLE_REGISTERS): (9, 8),
+}
+
+
+def wire_bytes(mode, function, length):
+    sent, received = FRAME_BYTES[(mode, function)]
+
+    if function == READ_HOLDING_REGISTERS:
+        return sent, received + length * 2
+
+    return sent + length * 2, received
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def __repr__(self):
+        return f"Histogram(count={self.count}, sum={self.sum})"
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, decode_buckets=DECODE_BUCKETS):
+        # Devices report to these hooks when they are given a metrics
+        # object. Override them to forward events elsewhere.
+        self.latency_buckets = latency_buckets
+        self.decode_buckets = decode_buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return f"Metrics({sum(h.count for h in self.requests.values())} requests, {sum(self.retries.values())} retries, {sum(self.connects.values())} connects)"
+
+    def reset(self):
+        self.requests = {}
+        self.errors = {}
+        self.retries = {}
+        self.connects = {}
+        self.decodes = {}
+        self.sent = {}
+        self.received = {}
+
+    def _device(self, device):
+        mode, *endpoint = device._endpoint()
+        return (":".join(str(e) for e in endpoint), device.model, str(device.unit))
+
+    def request(self, device, function, address, length, duration, ok):
+        labels = self._device(device)
+        sent, received = wire_bytes(device.mode.name, function, length)
+
+        with self.lock:
+            key = labels + (str(function), str(address), str(length))
+
+            if key not in self.requests:
+                self.requests[key] = Histogram(self.latency_buckets)
+
+            self.requests[key].observe(duration)
+            self.sent[labels] = self.sent.get(labels, 0) + sent
+
+            if ok:
+                self.received[labels] = self.received.get(labels, 0) + received
+            else:
+                key = labels + (str(function),)
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def retry(self, device):
+        labels = self._device(device)
+
+        with self.lock:
+            self.retries[labels] = self.retries.get(labels, 0) + 1
+
+    def connect(self, device, ok):
+        key = self._device(device) + (str(bool(ok)).lower(),)
+
+        with self.lock:
+            self.connects[key] = self.connects.get(key, 0) + 1
+
+    def decode(self, device, address, length, duration):
+        key = self._device(device) + (str(address), str(length))
+
+        with self.lock:
+            if key not in self.decodes:
+                self.decodes[key] = Histogram(self.decode_buckets)
+
+            self.decodes[key].observe(duration)
+
+    def _labels(self, names, values, extra=""):
+        labels = [f'{name}="{value}"' for name, value in zip(names, values)]
+
+        if extra:
+            labels.append(extra)
+
+        return "{" + ",".join(labels) + "}"
+
+    def _histogram(self, lines, name, names, histograms):
+        lines.append(f"# TYPE {name} histogram")
+        lines.append(f"# UNIT {name} seconds")
+
+        for values, histogram in sorted(histograms.items()):
+            cumulative = 0
+
+            for bucket, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                cumulative += count
+                le = f'le="{bucket}"'
+                lines.append(f"{name}_bucket{self._labels(names, values, le)} {cumulative}")
+
+            lines.append(f"{name}_count{self._labels(names, values)} {histogram.count}")
+            lines.append(f"{name}_sum{self._labels(names, values)} {histogram.sum}")
+
+    def _counter(self, lines, name, names, counters, unit=None):
+        lines.append(f"# TYPE {name} counter")
+
+        if unit:
+            lines.append(f"# UNIT {name} {unit}")
+
+        for values, count in sorted(counters.items()):
+            lines.append(f"{name}_total{self._labels(names, values)} {count}")
+
+    def openmetrics(self):
+        # Export in the OpenMetrics text format, served with CONTENT_TYPE
+        device = ("endpoint", "model", "unit")
+        lines = []
+
+        with self.lock:
+            self._histogram(lines, "solaredge_modbus_request_duration_seconds", device + ("function", "address", "length"), self.requests)
+            self._counter(lines, "solaredge_modbus_request_errors", device + ("function",), self.errors)
+            self._counter(lines, "solaredge_modbus_retries", device, self.retries)
+            self._counter(lines, "solaredge_modbus_connects", device + ("ok",), self.connects)
+            self._histogram(lines, "solaredge_modbus_decode_duration_seconds", device + ("address", "length"), self.decodes)
+            self._counter(lines, "solaredge_modbus_sent_bytes", device, self.sent, "bytes")
+            self._counter(lines, "solaredge_modbus_received_bytes", device, self.received, "bytes")
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
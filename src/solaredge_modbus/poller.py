@@ -0,0 +1,91 @@
+import concurrent.futures
+import threading
+
+from pymodbus.exceptions import ModbusException
+
+from . import Inverter
+from . import RETRIES
+from . import TIMEOUT
+
+
+WORKERS = 8
+
+
+class Poller:
+
+    def __init__(
+        self, targets,
+        workers=WORKERS, timeout=TIMEOUT, retries=RETRIES,
+        keys=False, scaled=False, devices=False, metrics=False
+    ):
+        self.keys = keys
+        self.scaled = scaled
+        self.devices = devices
+        self.inverters = {}
+        self.endpoints = {}
+        self.locks = {}
+
+        # Inverters behind the same host and port share one connection, and
+        # are polled one after another on it. Different endpoints are polled
+        # concurrently.
+        for host, port, unit in targets:
+            endpoint = (host, port)
+
+            if endpoint in self.endpoints:
+                leader = self.inverters[self.endpoints[endpoint][0]]
+                inverter = Inverter(parent=leader, unit=unit)
+            else:
+                inverter = Inverter(host=host, port=port, timeout=timeout, retries=retries, unit=unit, metrics=metrics)
+                self.endpoints[endpoint] = []
+                self.locks[endpoint] = threading.Lock()
+
+            self.inverters[(host, port, unit)] = inverter
+            self.endpoints[endpoint].append((host, port, unit))
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(self.endpoints)) or 1)
+
+    def __repr__(self):
+        return f"Poller({len(self.inverters)} inverters, {len(self.endpoints)} endpoints)"
+
+    def _read(self, device):
+        if self.keys:
+            return device.read_many([k for k in self.keys if k in device.registers], scaled=self.scaled)
+
+        return device.read_all(scaled=self.scaled)
+
+    def _poll_endpoint(self, endpoint):
+        results = {}
+
+        with self.locks[endpoint]:
+            for target in self.endpoints[endpoint]:
+                inverter = self.inverters[target]
+
+                try:
+                    values = self._read(inverter)
+
+                    if self.devices:
+                        values["meters"] = {name: self._read(meter) for name, meter in inverter.meters().items()}
+                        values["batteries"] = {name: self._read(battery) for name, battery in inverter.batteries().items()}
+                except (ModbusException, OSError):
+                    values = {}
+
+                results[target] = values
+
+        return results
+
+    def poll(self):
+        futures = [self.executor.submit(self._poll_endpoint, endpoint) for endpoint in self.endpoints]
+        results = {}
+
+        for future in futures:
+            results.update(future.result())
+
+        return results
+
+    def close(self):
+        # Connections are closed once no inverter, here or elsewhere, uses
+        # them any more
+        self.executor.shutdown(wait=True)
+
+        for inverter in self.inverters.values():
+            inverter.disconnect()
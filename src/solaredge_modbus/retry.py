@@ -0,0 +1,83 @@
+import enum
+import random
+import threading
+import time
+
+
+BACKOFF_BASE = 0.1
+BACKOFF_CAP = 5
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+
+
+class circuitState(enum.Enum):
+    CLOSED = 1
+    OPEN = 2
+    HALF_OPEN = 3
+
+
+class RetryPolicy:
+
+    def __init__(self, base=BACKOFF_BASE, cap=BACKOFF_CAP, jitter=True):
+        self.base = base
+        self.cap = cap
+        self.jitter = jitter
+
+    def __repr__(self):
+        return f"RetryPolicy(base={self.base}, cap={self.cap}, jitter={self.jitter})"
+
+    def delay(self, attempt):
+        # Exponential backoff with full jitter, attempt counts from 0. The
+        # exponent is clamped, as a float base would overflow long before
+        # attempts run out during a long outage.
+        delay = min(self.cap, self.base * (2 ** min(attempt, 64)))
+
+        if self.jitter:
+            return random.uniform(0, delay)
+
+        return delay
+
+
+class CircuitBreaker:
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = circuitState.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"CircuitBreaker({self.state}: failures={self.failures}, threshold={self.threshold}, reset_timeout={self.reset_timeout})"
+
+    def allow(self):
+        # While open, requests fail fast until reset_timeout has passed, after
+        # which a single request is let through half-open to probe the
+        # device. Should the probe never report back, another one is let
+        # through after reset_timeout.
+        with self.lock:
+            if self.state is not circuitState.CLOSED:
+                if (time.monotonic() - self.opened) < self.reset_timeout:
+                    return False
+
+                self.state = circuitState.HALF_OPEN
+                self.opened = time.monotonic()
+
+            return True
+
+    def success(self):
+        with self.lock:
+            self.state = circuitState.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+
+            if self.threshold and (self.state is circuitState.HALF_OPEN or self.failures >= self.threshold):
+                self.state = circuitState.OPEN
+                self.opened = time.monotonic()
+
+    def reset(self):
+        self.success()
@@ -0,0 +1,78 @@
+import math
+import time
+
+
+def next_tick(deadline, interval):
+    # Advance to the next tick on the fixed schedule, skipping ticks that
+    # were missed while reading instead of queueing them up. Returns the new
+    # deadline and the time left until it.
+    now = time.monotonic()
+    deadline += interval
+
+    if now >= deadline:
+        deadline += (((now - deadline) // interval) + 1) * interval
+
+    return deadline, deadline - now
+
+
+class Scheduler:
+
+    def __init__(self, device, periods, default=False, scaled=False):
+        # periods maps a register key, a batch number, or a tuple of keys to
+        # a poll period in seconds. Keys not covered are polled every default
+        # seconds, or not at all.
+        self.device = device
+        self.scaled = scaled
+        self.periods = {}
+
+        if default:
+            self.periods.update({k: default for k in device.registers})
+
+        for group, period in periods.items():
+            if isinstance(group, int):
+                keys = [k for k, v in device.registers.items() if v.batch == group]
+            elif isinstance(group, str):
+                keys = [group]
+            else:
+                keys = list(group)
+
+            for k in keys:
+                if k not in device.registers:
+                    raise KeyError(k)
+
+                self.periods[k] = period
+
+        self.start = time.monotonic()
+        self.due = {k: self.start for k in self.periods}
+
+    def __repr__(self):
+        return f"Scheduler({self.device}, {len(self.periods)} keys, periods={sorted(set(self.periods.values()))})"
+
+    def poll(self):
+        # Read every key that is due in one read_many() call, so due keys are
+        # merged into as few requests as possible. Keys stay on a fixed grid
+        # per period, so the same key sets recur and reuse cached read plans.
+        now = time.monotonic()
+        due = [k for k, t in self.due.items() if t <= now]
+
+        if not due:
+            return {}
+
+        for k in due:
+            period = self.periods[k]
+            self.due[k] = self.start + (math.floor((now - self.start) / period) + 1) * period
+
+        return self.device.read_many(due, scaled=self.scaled)
+
+    def run(self, tick=False):
+        tick = tick or min(self.periods.values())
+        deadline = time.monotonic()
+
+        while True:
+            values = self.poll()
+
+            if values:
+                yield time.time(), values
+
+            deadline, delay = next_tick(deadline, tick)
+            time.sleep(delay)
@@ -0,0 +1,502 @@
+import argparse
+import asyncio
+import math
+import random
+import struct
+import time
+
+from pymodbus.constants import Endian
+
+from . import BATTERY_REGISTER_OFFSETS
+from . import METER_REGISTER_OFFSETS
+from . import POW10
+from . import STRUCT_FORMATS
+from . import Battery
+from . import Inverter
+from . import Meter
+from . import StorEdge
+from . import registerDataType
+
+
+DAY = 86400
+RESOLUTION = 1
+RATINGS = [3000, 5000, 8000, 10000]
+
+# Scale factors served for each scale register, chosen to keep typical
+# values within the range of their register
+SCALES = {
+    "current_scale": -2,
+    "voltage_scale": -1,
+    "frequency_scale": -2,
+    "power_factor_scale": -2,
+    "current_dc_scale": -3,
+    "voltage_dc_scale": -1,
+    "temperature_scale": -2,
+}
+
+LIMITS = {
+    "UINT16": (0, 0xfffe),
+    "INT16": (-0x7fff, 0x7fff),
+    "UINT32": (0, 0xfffffffe),
+    "ACC32": (0, 0xffffffff),
+    "INT32": (-0x7fffffff, 0x7fffffff),
+    "UINT64": (0, 0xfffffffffffffffe),
+}
+
+# Register tables served, as device class and register offset
+DEVICES = (
+    [(Inverter, 0), (StorEdge, 0)]
+    + [(Meter, offset) for offset in METER_REGISTER_OFFSETS]
+    + [(Battery, offset) for offset in BATTERY_REGISTER_OFFSETS]
+)
+
+EXCEPTION_ILLEGAL_FUNCTION = 0x01
+EXCEPTION_ILLEGAL_ADDRESS = 0x02
+EXCEPTION_ILLEGAL_VALUE = 0x03
+EXCEPTION_GATEWAY_TARGET = 0x0b
+
+
+def encode(value, length, dtype, wordorder):
+    # Encode a value into the registers of a register map entry, the
+    # reverse of BlockDecoder
+    if dtype == registerDataType.STRING:
+        data = str(value).encode("utf-8")[:length * 2].ljust(length * 2, b"\x00")
+        return list(struct.unpack(f">{length}H", data))
+
+    fmt = STRUCT_FORMATS[dtype.name]
+
+    if fmt == "f":
+        data = struct.pack(">f", value)
+    else:
+        low, high = LIMITS[dtype.name]
+        data = struct.pack(f">{fmt}", min(max(int(round(value)), low), high))
+
+    words = list(struct.unpack(f">{len(data) // 2}H", data))
+
+    if wordorder == Endian.LITTLE:
+        words.reverse()
+
+    return words + [0] * (length - len(words))
+
+
+class SimulatedInverter:
+
+    def __init__(self, unit=1, meters=1, batteries=0, rated=False, day=DAY, seed=False):
+        self.unit = unit
+        self.meters = meters
+        self.batteries = batteries
+        self.day = day
+        self.random = random.Random(None if seed is False else seed)
+        self.rated = rated or self.random.choice(RATINGS)
+        self.phase = self.random.uniform(-0.02, 0.02)
+        self.load = self.rated * self.random.uniform(0.05, 0.15)
+        self.capacity = 9800
+        self.soe = self.random.uniform(20, 80)
+        self.energy = {"total": self.random.uniform(1e6, 1e7), "import": 0, "export": 0, "charge": 0, "discharge": 0}
+        self.writes = {}
+        self.memory = {}
+        self.origin = time.monotonic()
+        self.updated = None
+
+    def __repr__(self):
+        return f"SimulatedInverter(unit={self.unit}, rated={self.rated}, meters={self.meters}, batteries={self.batteries})"
+
+    def _time_of_day(self, now):
+        # Simulated days start at 9:00, and last day seconds each
+        return (0.375 + self.phase + (now - self.origin) / self.day) % 1
+
+    def _step(self, now):
+        dt = 0 if self.updated is None else (now - self.updated) * DAY / self.day
+        self.updated = now
+
+        tod = self._time_of_day(now)
+        cloud = 1 - 0.3 * self.random.random() ** 4
+        self.pv = self.rated * max(0.0, math.sin(math.pi * (tod - 0.25) / 0.5)) * cloud
+        self.consumption = self.load * (1.5 + math.sin(2 * math.pi * (tod - 0.3))) * self.random.uniform(0.9, 1.1)
+
+        # Surplus charges the batteries, and they cover the deficit until
+        # they run empty
+        self.battery = 0.0
+
+        if self.batteries:
+            limit = 5000 * self.batteries
+            surplus = self.pv - self.consumption
+
+            if (surplus > 0 and self.soe < 100) or (surplus < 0 and self.soe > 5):
+                self.battery = min(max(surplus, -limit), limit)
+
+            self.soe = min(max(self.soe + self.battery * dt / 3600 / (self.capacity * self.batteries) * 100, 0), 100)
+
+        self.grid = self.consumption - self.pv + self.battery
+
+        self.energy["total"] += self.pv * dt / 3600
+        self.energy["import"] += max(self.grid, 0) * dt / 3600
+        self.energy["export"] += max(-self.grid, 0) * dt / 3600
+        self.energy["charge"] += max(self.battery, 0) * dt / 3600
+        self.energy["discharge"] += max(-self.battery, 0) * dt / 3600
+
+    def _noise(self, value, amount=0.005):
+        return value * (1 + self.random.uniform(-amount, amount))
+
+    def _inverter_values(self):
+        voltage = self._noise(230)
+        current = self.pv / voltage
+        power_dc = self.pv / 0.975 if self.pv else 0
+        voltage_dc = self._noise(380) if self.pv else 0
+
+        return {
+            "c_id": "SunS",
+            "c_did": 1,
+            "c_length": 65,
+            "c_manufacturer": "SolarEdge",
+            "c_model": f"SE{self.rated // 1000}K",
+            "c_version": "0004.0018.0518",
+            "c_serialnumber": f"7E{self.unit:06X}",
+            "c_deviceaddress": self.unit,
+            "c_sunspec_did": 103,
+            "c_sunspec_length": 50,
+            "current": current,
+            "l1_current": current / 3,
+            "l2_current": current / 3,
+            "l3_current": current / 3,
+            "l1_voltage": voltage * math.sqrt(3),
+            "l2_voltage": voltage * math.sqrt(3),
+            "l3_voltage": voltage * math.sqrt(3),
+            "l1n_voltage": voltage,
+            "l2n_voltage": self._noise(230),
+            "l3n_voltage": self._noise(230),
+            "power_ac": self.pv,
+            "frequency": self._noise(50, 0.001),
+            "power_apparent": self.pv,
+            "power_reactive": self.pv * 0.02,
+            "power_factor": 100 if self.pv else 0,
+            "energy_total": self.energy["total"],
+            "current_dc": power_dc / voltage_dc if voltage_dc else 0,
+            "voltage_dc": voltage_dc,
+            "power_dc": power_dc,
+            "temperature": 25 + 20 * self.pv / self.rated,
+            "status": 4 if self.pv else 2,
+            "active_power_limit": 100,
+            "cosphi": 1.0,
+            "reactive_power_response_time": 200,
+            "advanced_power_control_enable": 1,
+            "rc_cmd_timeout": 3600,
+        }
+
+    def _storedge_values(self):
+        return {
+            "storedge_control_mode": 1 if self.batteries else 0,
+            "storedge_backup_reserved": 10.0 if self.batteries else 0.0,
+            "storedge_remote_command_timeout": 3600,
+            "storedge_remote_charge_limit": 5000.0,
+            "storedge_remote_discharge_limit": 5000.0,
+        }
+
+    def _meter_values(self, idx):
+        power = -self.grid
+        voltage = self._noise(230)
+        current = abs(power) / voltage
+
+        return {
+            "c_manufacturer": "WattNode",
+            "c_model": "WNC-3Y-400-MB",
+            "c_option": "Export+Import",
+            "c_version": "31",
+            "c_serialnumber": f"{self.unit * 10 + idx:08d}",
+            "c_deviceaddress": 2 + idx,
+            "c_sunspec_did": 203,
+            "c_sunspec_length": 105,
+            "current": current,
+            "l1_current": current / 3,
+            "l2_current": current / 3,
+            "l3_current": current / 3,
+            "voltage_ln": voltage,
+            "l1n_voltage": voltage,
+            "l2n_voltage": self._noise(230),
+            "l3n_voltage": self._noise(230),
+            "voltage_ll": voltage * math.sqrt(3),
+            "l12_voltage": voltage * math.sqrt(3),
+            "l23_voltage": voltage * math.sqrt(3),
+            "l31_voltage": voltage * math.sqrt(3),
+            "frequency": self._noise(50, 0.001),
+            "power": power,
+            "l1_power": power / 3,
+            "l2_power": power / 3,
+            "l3_power": power / 3,
+            "power_apparent": abs(power),
+            "l1_power_apparent": abs(power) / 3,
+            "l2_power_apparent": abs(power) / 3,
+            "l3_power_apparent": abs(power) / 3,
+            "power_factor": 100 if power >= 0 else -100,
+            "l1_power_factor": 100 if power >= 0 else -100,
+            "l2_power_factor": 100 if power >= 0 else -100,
+            "l3_power_factor": 100 if power >= 0 else -100,
+            "export_energy_active": self.energy["export"],
+            "l1_export_energy_active": self.energy["export"] / 3,
+            "l2_export_energy_active": self.energy["export"] / 3,
+            "l3_export_energy_active": self.energy["export"] / 3,
+            "import_energy_active": self.energy["import"],
+            "l1_import_energy_active": self.energy["import"] / 3,
+            "l2_import_energy_active": self.energy["import"] / 3,
+            "l3_import_energy_active": self.energy["import"] / 3,
+            "export_energy_apparent": self.energy["export"],
+            "import_energy_apparent": self.energy["import"],
+        }
+
+    def _battery_values(self, idx):
+        power = self.battery / self.batteries
+        voltage = self._noise(400)
+
+        return {
+            "c_manufacturer": "LG",
+            "c_model": "RESU 10H",
+            "c_version": "1.3.4",
+            "c_serialnumber": f"LG{self.unit * 10 + idx:08d}",
+            "c_deviceaddress": 15 + idx,
+            "c_sunspec_did": 802,
+            "rated_energy": float(self.capacity),
+            "maximum_charge_continuous_power": 5000.0,
+            "maximum_discharge_continuous_power": 5000.0,
+            "maximum_charge_peak_power": 7000.0,
+            "maximum_discharge_peak_power": 7000.0,
+            "average_temperature": 25 + abs(power) / 1000,
+            "maximum_temperature": 27 + abs(power) / 1000,
+            "instantaneous_voltage": voltage,
+            "instantaneous_current": power / voltage,
+            "instantaneous_power": power,
+            "lifetime_export_energy_counter": self.energy["discharge"] / self.batteries,
+            "lifetime_import_energy_counter": self.energy["charge"] / self.batteries,
+            "maximum_energy": self.capacity * 0.98,
+            "available_energy": self.capacity * 0.98 * self.soe / 100,
+            "soh": 98.0,
+            "soe": self.soe,
+            "status": 3 if power > 0 else 4 if power < 0 else 6,
+            "status_internal": 3 if power > 0 else 4 if power < 0 else 6,
+        }
+
+    def _values(self, device, offset):
+        # Devices that are not present only serve the register the inverter
+        # probes to discover them
+        if device is Inverter:
+            return True, self._inverter_values()
+        elif device is StorEdge:
+            return True, self._storedge_values()
+        elif device is Meter:
+            idx = METER_REGISTER_OFFSETS.index(offset)
+
+            if idx >= self.meters:
+                return False, {"c_sunspec_did": 0}
+
+            return True, self._meter_values(idx)
+        else:
+            idx = BATTERY_REGISTER_OFFSETS.index(offset)
+
+            if idx >= self.batteries:
+                return False, {"c_deviceaddress": 255}
+
+            return True, self._battery_values(idx)
+
+    def update(self, now=None):
+        # Rebuild the register memory from the current state of the
+        # simulated site
+        now = time.monotonic() if now is None else now
+        self._step(now)
+        memory = {}
+
+        for device, offset in DEVICES:
+            present, values = self._values(device, offset)
+            scales = device._scale_table(offset)
+
+            for k, (address, length, rtype, dtype, vtype, label, fmt, batch) in device._register_table(offset).items():
+                if not present and k not in values:
+                    continue
+                elif k.endswith("_scale"):
+                    value = SCALES.get(k, 0)
+                elif k in values:
+                    value = values[k]
+
+                    if k in scales:
+                        value = value / POW10[SCALES.get(scales[k], 0)]
+                elif dtype == registerDataType.STRING:
+                    value = ""
+                else:
+                    value = 0
+
+                for i, word in enumerate(encode(value, length, dtype, device._wordorder(address))):
+                    memory[address + i] = word
+
+        memory.update(self.writes)
+        self.memory = memory
+
+    def read(self, address, count, now=None):
+        now = time.monotonic() if now is None else now
+
+        if self.updated is None or (now - self.updated) >= RESOLUTION:
+            self.update(now)
+
+        return [self.memory.get(address + i, 0) for i in range(count)]
+
+    def write(self, address, values):
+        for i, value in enumerate(values):
+            self.writes[address + i] = value
+            self.memory[address + i] = value
+
+
+class Simulator:
+
+    def __init__(
+        self, units=1, meters=1, batteries=0,
+        latency=0, jitter=0, loss=0, max_connections=False,
+        day=DAY, seed=False
+    ):
+        # One server simulates a SolarEdge inverter per unit id, with its
+        # meters and batteries behind it, the way a leader inverter serves
+        # followers on its RS485 bus
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.max_connections = max_connections
+        self.random = random.Random(seed if seed is not False else None)
+        self.inverters = {
+            unit: SimulatedInverter(
+                unit=unit, meters=meters, batteries=batteries, day=day,
+                seed=self.random.random()
+            )
+            for unit in range(1, units + 1)
+        }
+        self.connections = 0
+        self.requests = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.server = None
+
+    def __repr__(self):
+        return f"Simulator({len(self.inverters)} units, connections={self.connections}, requests={self.requests}, dropped={self.dropped})"
+
+    def _exception(self, fc, code):
+        return struct.pack(">BB", fc | 0x80, code)
+
+    def _respond(self, unit, pdu):
+        fc = pdu[0]
+        inverter = self.inverters.get(unit)
+
+        if inverter is None:
+            return self._exception(fc, EXCEPTION_GATEWAY_TARGET)
+
+        if fc == 3:
+            if len(pdu) != 5:
+                return self._exception(fc, EXCEPTION_ILLEGAL_VALUE)
+
+            address, count = struct.unpack(">HH", pdu[1:5])
+
+            if not 1 <= count <= 125:
+                return self._exception(fc, EXCEPTION_ILLEGAL_VALUE)
+            if address + count > 0x10000:
+                return self._exception(fc, EXCEPTION_ILLEGAL_ADDRESS)
+
+            return struct.pack(f">BB{count}H", fc, count * 2, *inverter.read(address, count))
+        elif fc == 16:
+            if len(pdu) < 6:
+                return self._exception(fc, EXCEPTION_ILLEGAL_VALUE)
+
+            address, count, size = struct.unpack(">HHB", pdu[1:6])
+
+            if not 1 <= count <= 123 or size != count * 2 or len(pdu) != 6 + size:
+                return self._exception(fc, EXCEPTION_ILLEGAL_VALUE)
+            if address + count > 0x10000:
+                return self._exception(fc, EXCEPTION_ILLEGAL_ADDRESS)
+
+            inverter.write(address, struct.unpack(f">{count}H", pdu[6:]))
+            return struct.pack(">BHH", fc, address, count)
+        else:
+            return self._exception(fc, EXCEPTION_ILLEGAL_FUNCTION)
+
+    async def _handle(self, reader, writer):
+        # SolarEdge inverters only accept a limited number of Modbus TCP
+        # connections, further connections are closed straight away
+        if self.max_connections and self.connections >= self.max_connections:
+            self.rejected += 1
+            writer.close()
+            return
+
+        self.connections += 1
+
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                transaction, protocol, length, unit = struct.unpack(">HHHB", header)
+
+                if length < 2:
+                    break
+
+                pdu = await reader.readexactly(length - 1)
+                self.requests += 1
+
+                if self.loss and self.random.random() < self.loss:
+                    self.dropped += 1
+                    continue
+
+                response = self._respond(unit, pdu)
+                delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+
+                if delay:
+                    await asyncio.sleep(delay)
+
+                writer.write(struct.pack(">HHHB", transaction, protocol, len(response) + 1, unit) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=1502):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def serve_forever(self, host="127.0.0.1", port=1502):
+        await self.start(host, port)
+
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server:
+            self.server.close()
+            self.server = None
+
+
+async def serve(host, port, servers=1, **kwargs):
+    # Start a simulator per port, on consecutive ports from port
+    simulators = [Simulator(**kwargs) for i in range(servers)]
+
+    for i, simulator in enumerate(simulators):
+        await simulator.start(host, port + i)
+
+    await asyncio.gather(*(simulator.server.serve_forever() for simulator in simulators))
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--host", type=str, default="127.0.0.1", help="Listen address")
+    argparser.add_argument("--port", type=int, default=1502, help="First listen port")
+    argparser.add_argument("--servers", type=int, default=1, help="Number of simulated inverters, one per port")
+    argparser.add_argument("--units", type=int, default=1, help="Unit ids served per port")
+    argparser.add_argument("--meters", type=int, default=1, help="Meters per inverter")
+    argparser.add_argument("--batteries", type=int, default=0, help="Batteries per inverter")
+    argparser.add_argument("--latency", type=float, default=0, help="Response latency in seconds")
+    argparser.add_argument("--jitter", type=float, default=0, help="Random extra latency in seconds")
+    argparser.add_argument("--loss", type=float, default=0, help="Fraction of requests left unanswered")
+    argparser.add_argument("--max-connections", type=int, default=0, help="Concurrent connections per port, 0 for unlimited")
+    argparser.add_argument("--day", type=float, default=DAY, help="Length of a simulated day in seconds")
+    args = argparser.parse_args()
+
+    try:
+        asyncio.run(serve(
+            args.host, args.port, servers=args.servers,
+            units=args.units, meters=args.meters, batteries=args.batteries,
+            latency=args.latency, jitter=args.jitter, loss=args.loss,
+            max_connections=args.max_connections, day=args.day
+        ))
+    except KeyboardInterrupt:
+        pass
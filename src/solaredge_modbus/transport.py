@@ -0,0 +1,257 @@
+import collections
+import threading
+import time
+import weakref
+
+
+IDLE_TIMEOUT = False
+CHARACTER_BITS = 11
+
+
+class SharedClient:
+
+    def __init__(self, client, key):
+        self.client = client
+        self.key = key
+        self.lock = threading.RLock()
+        self.references = 0
+        self.last_used = time.monotonic()
+
+    def __repr__(self):
+        return f"SharedClient({self.key}, references={self.references})"
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def connect(self):
+        with self.lock:
+            self.last_used = time.monotonic()
+            return self.client.connect()
+
+    def close(self):
+        with self.lock:
+            return self.client.close()
+
+    def is_socket_open(self):
+        return self.client.is_socket_open()
+
+    def read_holding_registers(self, *args, **kwargs):
+        with self.lock:
+            self.last_used = time.monotonic()
+            return self.client.read_holding_registers(*args, **kwargs)
+
+    def write_registers(self, *args, **kwargs):
+        with self.lock:
+            self.last_used = time.monotonic()
+            return self.client.write_registers(*args, **kwargs)
+
+    def idle(self, idle_timeout):
+        return (time.monotonic() - self.last_used) > idle_timeout
+
+
+class SerialBus(SharedClient):
+
+    def __init__(self, client, key):
+        super().__init__(client, key)
+        self.condition = threading.Condition(self.lock)
+        self.queues = collections.OrderedDict()
+        self.busy = False
+        self.last_frame_end = 0
+        self.created = time.monotonic()
+        self.busy_time = 0
+        self.units = {}
+
+        # Modbus RTU requires 3.5 character times of silence between frames,
+        # fixed at 1.75 ms above 19200 baud
+        baud = client.comm_params.baudrate
+        self.settings = (baud, client.comm_params.parity, client.comm_params.stopbits)
+
+        if baud > 19200:
+            self.gap = 0.00175
+        else:
+            self.gap = 3.5 * CHARACTER_BITS / baud
+
+    def __repr__(self):
+        return f"SerialBus({self.key}, references={self.references}, utilisation={self.utilisation():.2f})"
+
+    def check(self, baud, parity, stopbits):
+        # Every device on a serial line has to use the same line settings,
+        # the port is only opened once
+        if (baud, parity, stopbits) != self.settings:
+            raise ValueError(f"{self.key[-1]} is already open with baud={self.settings[0]}, parity={self.settings[1]}, stopbits={self.settings[2]}")
+
+    def _next(self):
+        for unit, queue in self.queues.items():
+            if queue:
+                return queue[0]
+
+        return None
+
+    def _transaction(self, unit, call, *args, **kwargs):
+        # Requests queue per unit, and units take turns in round robin order
+        # so a busy unit cannot starve the others on the line
+        ticket = object()
+
+        with self.condition:
+            self.queues.setdefault(unit, collections.deque()).append(ticket)
+
+            while self.busy or self._next() is not ticket:
+                self.condition.wait()
+
+            self.busy = True
+            self.queues[unit].popleft()
+            self.queues.move_to_end(unit)
+
+        start = time.monotonic()
+
+        try:
+            silence = self.last_frame_end + self.gap - start
+
+            if silence > 0:
+                time.sleep(silence)
+                start += silence
+
+            self.last_used = start
+            return call(*args, **kwargs)
+        finally:
+            end = time.monotonic()
+
+            with self.condition:
+                requests, busy_time = self.units.get(unit, (0, 0))
+                self.units[unit] = (requests + 1, busy_time + (end - start))
+                self.busy_time += end - start
+                self.last_frame_end = end
+                self.busy = False
+                self.condition.notify_all()
+
+    def connect(self):
+        return self._transaction(None, self.client.connect)
+
+    def close(self):
+        return self._transaction(None, self.client.close)
+
+    def read_holding_registers(self, *args, **kwargs):
+        return self._transaction(kwargs.get("slave"), self.client.read_holding_registers, *args, **kwargs)
+
+    def write_registers(self, *args, **kwargs):
+        return self._transaction(kwargs.get("slave"), self.client.write_registers, *args, **kwargs)
+
+    def utilisation(self):
+        elapsed = time.monotonic() - self.created
+
+        if not elapsed:
+            return 0
+
+        return self.busy_time / elapsed
+
+    def stats(self):
+        return {
+            "utilisation": self.utilisation(),
+            "busy_time": self.busy_time,
+            "units": {
+                unit: {"requests": requests, "busy_time": busy_time}
+                for unit, (requests, busy_time) in self.units.items()
+                if unit is not None
+            }
+        }
+
+
+class TransportRegistry:
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        # Closing idle connections is opt-in. A closed connection drops the
+        # identity and topology caches of the devices using it, so it only
+        # pays off when polls are far apart and connections are scarce.
+        self.idle_timeout = idle_timeout
+        self.clients = {}
+        self.owners = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+        self.reaper = None
+
+    def __repr__(self):
+        return f"TransportRegistry({list(self.clients.values())})"
+
+    def acquire(self, key, factory, owner, shared_class=SharedClient):
+        # Hand out the client for an endpoint, creating it on first use. The
+        # reference taken here is dropped when the owner is garbage collected.
+        with self.lock:
+            shared = self.clients.get(key)
+
+            if shared is None:
+                shared = self.clients[key] = shared_class(factory(), key)
+
+            shared.references += 1
+
+            if self.idle_timeout and (self.reaper is None or not self.reaper.is_alive()):
+                self.reaper = threading.Thread(target=self._reap, name="solaredge_modbus-reaper", daemon=True)
+                self.reaper.start()
+
+        self._track(shared, owner)
+        return shared
+
+    def retain(self, shared, owner):
+        # Take another reference to a client handed out earlier, for a device
+        # that uses the client of its parent, so the client stays open for as
+        # long as either of them is alive
+        with self.lock:
+            shared.references += 1
+
+        self._track(shared, owner)
+        return shared
+
+    def _track(self, shared, owner):
+        # An owner holds a single reference at a time, released when it is
+        # garbage collected or detached, whichever comes first
+        self.detach(owner)
+        self.owners[owner] = weakref.finalize(owner, self.release, shared)
+
+    def holds(self, owner):
+        return owner in self.owners
+
+    def detach(self, owner):
+        # Drop the reference of owner early. The client is only closed once
+        # no other device holds a reference to it.
+        finalizer = self.owners.pop(owner, None)
+
+        if finalizer is not None:
+            finalizer()
+
+    def release(self, shared):
+        with self.lock:
+            shared.references -= 1
+
+            if shared.references > 0 or self.clients.get(shared.key) is not shared:
+                return
+
+            del self.clients[shared.key]
+
+        shared.close()
+
+    def close_idle(self, idle_timeout=None):
+        if idle_timeout is None:
+            idle_timeout = self.idle_timeout
+
+        if not idle_timeout:
+            return
+
+        with self.lock:
+            clients = list(self.clients.values())
+
+        for shared in clients:
+            # Devices reconnect on their next read, so closing is safe
+            if shared.is_socket_open() and shared.idle(idle_timeout):
+                shared.close()
+
+    def _reap(self):
+        while True:
+            time.sleep(self.idle_timeout / 2)
+
+            with self.lock:
+                if not self.clients or not self.idle_timeout:
+                    self.reaper = None
+                    return
+
+            self.close_idle()
+
+
+TRANSPORTS = TransportRegistry()
@@ -0,0 +1,114 @@
+import numpy
+
+from pymodbus.constants import Endian
+
+from . import SUNSPEC_NOTIMPLEMENTED
+from . import registerDataType
+
+
+WORDS = {
+    registerDataType.UINT16: 1,
+    registerDataType.INT16: 1,
+    registerDataType.UINT32: 2,
+    registerDataType.INT32: 2,
+    registerDataType.ACC32: 2,
+    registerDataType.FLOAT32: 2,
+    registerDataType.SEFLOAT: 2,
+    registerDataType.UINT64: 4,
+}
+
+VIEWS = {
+    registerDataType.UINT16: numpy.uint16,
+    registerDataType.INT16: numpy.int16,
+    registerDataType.UINT32: numpy.uint32,
+    registerDataType.INT32: numpy.int32,
+    registerDataType.ACC32: numpy.uint32,
+    registerDataType.FLOAT32: numpy.float32,
+    registerDataType.SEFLOAT: numpy.float32,
+    registerDataType.UINT64: numpy.uint64,
+}
+
+CONTAINERS = {
+    1: numpy.uint16,
+    2: numpy.uint32,
+    4: numpy.uint64,
+}
+
+
+def _combine(words, wordorder):
+    # Join N x W registers into one unsigned integer per row, most
+    # significant register first unless the word order is little endian.
+    count = words.shape[1]
+    container = CONTAINERS[count]
+
+    if wordorder == Endian.LITTLE:
+        words = words[:, ::-1]
+
+    combined = numpy.zeros(words.shape[0], dtype=container)
+
+    for idx in range(count):
+        combined |= words[:, idx].astype(container) << container(16 * (count - idx - 1))
+
+    return combined
+
+
+_decode_string = numpy.frompyfunc(lambda raw: raw.decode(encoding="utf-8", errors="ignore").replace("\x00", "").rstrip(), 1, 1)
+
+
+def _string(words):
+    raw = numpy.ascontiguousarray(words.astype(">u2")).view(f"S{words.shape[1] * 2}")[:, 0]
+
+    return _decode_string(raw).astype(str)
+
+
+def decode_column(data, dtype, vtype, wordorder):
+    if dtype == registerDataType.STRING:
+        decoded = _string(data)
+    elif dtype in WORDS:
+        decoded = _combine(data[:, :WORDS[dtype]], wordorder).view(VIEWS[dtype])
+    else:
+        raise NotImplementedError(dtype)
+
+    mask = (decoded == SUNSPEC_NOTIMPLEMENTED[dtype.name])
+
+    if decoded.dtype.kind == "f":
+        mask |= numpy.isnan(decoded)
+
+        # Floats stored as int, such as cosphi, are truncated like int() but
+        # kept as float64, since they do not necessarily fit in an int64.
+        if vtype is int:
+            decoded = numpy.trunc(decoded.astype(numpy.float64))
+
+    return numpy.ma.masked_array(decoded, mask=mask)
+
+
+def decode(device, data, address=None):
+    # Decode an N x R array of raw registers, one captured sample per row,
+    # into one masked column per register key that lies entirely within the
+    # R registers starting at address. Masked entries are values the device
+    # reports as not implemented.
+    if isinstance(device, type):
+        registers = device._register_table()
+    else:
+        registers = device.registers
+
+    data = numpy.asarray(data, dtype=numpy.uint16)
+
+    if data.ndim != 2:
+        raise ValueError(data.shape)
+
+    if address is None:
+        address = min(v.address for v in registers.values())
+
+    columns = {}
+
+    for k, v in registers.items():
+        register_address, length, rtype, dtype, vtype, label, unit, batch = v
+        offset = register_address - address
+
+        if offset < 0 or (offset + length) > data.shape[1]:
+            continue
+
+        columns[k] = decode_column(data[:, offset:offset + length], dtype, vtype, device._wordorder(register_address))
+
+    return columns
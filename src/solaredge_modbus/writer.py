@@ -0,0 +1,268 @@
+import collections
+import os
+import threading
+import time
+
+from .retry import RetryPolicy
+
+
+BATCH_SIZE = 5000
+FLUSH_INTERVAL = 10
+MAX_LINES = 100000
+MAX_SPOOL = 64 * 1024 * 1024
+
+
+def _escape(value, characters):
+    value = str(value).replace("\\", "\\\\")
+
+    for c in characters:
+        value = value.replace(c, f"\\{c}")
+
+    return value
+
+
+def _field(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    elif isinstance(value, int):
+        return f"{value}i"
+    elif isinstance(value, float):
+        return repr(value)
+    else:
+        return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def line(measurement, tags, fields, timestamp=None):
+    # Format one point in InfluxDB line protocol, with a timestamp in
+    # seconds written at nanosecond precision. Empty tags are left out.
+    tags = "".join(
+        f",{_escape(k, ', =')}={_escape(v, ', =')}"
+        for k, v in sorted(tags.items())
+        if v != ""
+    )
+    fields = ",".join(f"{_escape(k, ', =')}={_field(v)}" for k, v in fields.items())
+
+    if timestamp is None:
+        return f"{_escape(measurement, ', ')}{tags} {fields}"
+
+    return f"{_escape(measurement, ', ')}{tags} {fields} {int(timestamp * 1e9)}"
+
+
+class LineProtocolWriter:
+
+    def __init__(
+        self, send,
+        batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_lines=MAX_LINES,
+        spool=False, max_spool=MAX_SPOOL, retry_policy=False
+    ):
+        # send is called from a background thread with a list of lines, and
+        # raises if they could not be written. Lines are buffered in memory,
+        # then in files in the spool directory, until they are sent.
+        self.send = send
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_lines = max_lines
+        self.spool = spool
+        self.max_spool = max_spool
+        self.retry_policy = retry_policy or RetryPolicy(base=1, cap=60)
+        self.lines = collections.deque()
+        self.condition = threading.Condition()
+        self.closing = False
+        self.failures = 0
+        self.written = 0
+        self.sent = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.sequence = 0
+        self.segments = collections.deque()
+
+        if spool:
+            os.makedirs(spool, exist_ok=True)
+
+            for name in sorted(f for f in os.listdir(spool) if f.endswith(".lp")):
+                self.segments.append(self._segment(name))
+
+        self.thread = threading.Thread(target=self._run, name="solaredge_modbus-writer", daemon=True)
+        self.thread.start()
+
+    def __repr__(self):
+        return f"LineProtocolWriter(queued={len(self.lines)}, sent={self.sent}, spilled={self.spilled}, dropped={self.dropped}, failures={self.failures})"
+
+    def write(self, measurement, tags, fields, timestamp=None):
+        self.write_line(line(measurement, tags, fields, timestamp))
+
+    def write_line(self, point):
+        # Never blocks on the database or the spool. Once max_lines are
+        # queued the writer thread spills the oldest lines to the spool.
+        # Without a spool, or while the writer thread is busy and twice that
+        # is queued, the oldest line is dropped.
+        with self.condition:
+            self.lines.append(point)
+            self.written += 1
+
+            if len(self.lines) > self.max_lines:
+                if not self.spool or len(self.lines) > 2 * self.max_lines:
+                    self.lines.popleft()
+                    self.dropped += 1
+
+                self.condition.notify()
+            elif len(self.lines) >= self.batch_size:
+                self.condition.notify()
+
+    def _segment(self, name):
+        # Segments are named after the number of lines they hold, so the
+        # spool never has to be read back to account for them
+        path = os.path.join(self.spool, name)
+
+        try:
+            lines = int(name[:-3].split("-")[2])
+        except (IndexError, ValueError):
+            with open(path) as f:
+                lines = len(f.read().splitlines())
+
+        return path, lines, os.path.getsize(path)
+
+    def _spill(self, batch):
+        # The spool is only touched by the writer thread
+        if not self.spool:
+            with self.condition:
+                self.dropped += len(batch)
+
+            return
+
+        self.sequence += 1
+        path = os.path.join(self.spool, f"{time.time_ns()}-{self.sequence:06d}-{len(batch)}.lp")
+
+        with open(f"{path}.tmp", "w") as f:
+            f.write("\n".join(batch))
+
+        os.replace(f"{path}.tmp", path)
+
+        with self.condition:
+            self.segments.append((path, len(batch), os.path.getsize(path)))
+            self.spilled += len(batch)
+
+        # Keep the spool bounded by dropping its oldest segments
+        while len(self.segments) > 1 and sum(size for path, lines, size in self.segments) > self.max_spool:
+            segment = self.segments[0]
+            self._remove(segment)
+
+            with self.condition:
+                self.dropped += segment[1]
+
+    def _remove(self, segment):
+        with self.condition:
+            self.segments.remove(segment)
+
+        try:
+            os.remove(segment[0])
+        except FileNotFoundError:
+            pass
+
+    def _trim(self, keep=None):
+        # Spill the oldest lines beyond keep, max_lines by default
+        keep = self.max_lines if keep is None else keep
+
+        while True:
+            with self.condition:
+                if len(self.lines) <= keep:
+                    return
+
+                batch = [self.lines.popleft() for i in range(min(self.batch_size, len(self.lines) - keep))]
+
+            self._spill(batch)
+
+    def _wait(self, until, lines=False):
+        # Wait until closing, until, or until lines are queued, spilling what
+        # is queued beyond max_lines meanwhile
+        while True:
+            self._trim()
+
+            with self.condition:
+                if self.closing or time.monotonic() >= until or (lines and len(self.lines) >= lines):
+                    return
+
+                self.condition.wait(until - time.monotonic())
+
+    def _next_batch(self):
+        # Send spooled lines first, they are older than those in memory
+        if self.segments:
+            segment = self.segments[0]
+
+            try:
+                with open(segment[0]) as f:
+                    return f.read().splitlines(), segment
+            except FileNotFoundError:
+                return [], segment
+
+        with self.condition:
+            batch = [self.lines.popleft() for i in range(min(self.batch_size, len(self.lines)))]
+
+        return batch, None
+
+    def _flush(self):
+        # Send one batch, returns False once closed and nothing is left
+        self._wait(self.deadline, self.batch_size)
+
+        with self.condition:
+            if self.closing and not self.lines and not self.segments:
+                return False
+
+        batch, segment = self._next_batch()
+
+        if not batch:
+            if segment:
+                self._remove(segment)
+
+            self.deadline = time.monotonic() + self.flush_interval
+            return True
+
+        try:
+            self.send(batch)
+        except Exception:
+            if not segment:
+                with self.condition:
+                    self.lines.extendleft(reversed(batch))
+
+            if self.closing:
+                self._trim(0)
+                return False
+
+            raise
+
+        self.failures = 0
+        self.sent += len(batch)
+
+        if segment:
+            self._remove(segment)
+
+        with self.condition:
+            if len(self.lines) < self.batch_size and not self.segments:
+                self.deadline = time.monotonic() + self.flush_interval
+
+        return True
+
+    def _run(self):
+        # Failed sends, and anything else that goes wrong such as a full
+        # spool disk, are retried with backoff instead of ending the thread
+        self.deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                if not self._flush():
+                    return
+            except Exception:
+                if self.closing:
+                    return
+
+                self.failures += 1
+                self._wait(time.monotonic() + self.retry_policy.delay(self.failures - 1))
+
+    def close(self, timeout=None):
+        # Send what is left. The writer thread spools anything it cannot send,
+        # and carries on in the background if timeout runs out first.
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+
+        self.thread.join(timeout)
@@ -0,0 +1,35 @@
+import asyncio
+import gc
+import threading
+import time
+
+import pytest
+
+from solaredge_modbus.simulator import Simulator
+
+
+@pytest.fixture
+def simulator():
+    # A simulated inverter with a meter and a battery, served on a free port
+    # from an event loop in a background thread
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    simulator = Simulator(units=1, meters=1, batteries=1, seed=1)
+    server = asyncio.run_coroutine_threadsafe(simulator.start("127.0.0.1", 0), loop).result()
+    simulator.port = server.sockets[0].getsockname()[1]
+
+    yield simulator
+
+    # Let the devices of the test close their connections first
+    gc.collect()
+    deadline = time.monotonic() + 1
+
+    while simulator.connections and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    loop.call_soon_threadsafe(simulator.close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
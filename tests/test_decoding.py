@@ -0,0 +1,74 @@
+import random
+
+import pytest
+from pymodbus.constants import Endian
+from pymodbus.payload import BinaryPayloadDecoder
+
+import solaredge_modbus
+from solaredge_modbus import BlockDecoder
+
+
+DEVICES = (
+    [(solaredge_modbus.Inverter, 0), (solaredge_modbus.StorEdge, 0)]
+    + [(solaredge_modbus.Meter, offset) for offset in solaredge_modbus.METER_REGISTER_OFFSETS]
+    + [(solaredge_modbus.Battery, offset) for offset in solaredge_modbus.BATTERY_REGISTER_OFFSETS]
+)
+WORDORDERS = [Endian.BIG, Endian.LITTLE]
+
+
+def registers(length, seed):
+    # Random register data, with plenty of not implemented values
+    rnd = random.Random(seed)
+
+    return [rnd.choice([0x0000, 0x8000, 0xffff, rnd.randrange(0x10000)]) for i in range(length)]
+
+
+def reference(values, words, offset, wordorder):
+    # Decode every value on its own with pymodbus, the way read() does
+    results = {}
+
+    for k, v in values.items():
+        data = BinaryPayloadDecoder.fromRegisters(words[v.address - offset:v.address - offset + v.length], byteorder=Endian.BIG, wordorder=wordorder)
+        results[k] = solaredge_modbus.SolarEdge._decode_value(None, data, v.length, v.dtype, v.vtype, k.endswith("_scale"))
+
+    return results
+
+
+@pytest.mark.parametrize("wordorder", WORDORDERS)
+@pytest.mark.parametrize("device,offset", DEVICES)
+def test_block_decoder(device, offset, wordorder):
+    values = dict(device._register_table(offset))
+    start = min(v.address for v in values.values())
+    end = max(v.address + v.length for v in values.values())
+
+    for seed in range(10):
+        words = registers(end - start, f"{device.__name__}-{offset}-{wordorder}-{seed}")
+        decoder = BlockDecoder(values, start, wordorder)
+        expected = reference(values, words, start, wordorder)
+
+        assert decoder.decode(words) == expected
+
+        prepared = decoder.prepare(decoder.registers.pack(*words))
+
+        for k in values:
+            assert decoder.unpack_value(prepared, k) == expected[k], k
+
+
+def devices():
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=1502)
+
+    return (
+        [inverter, solaredge_modbus.StorEdge(parent=inverter)]
+        + [solaredge_modbus.Meter(offset=idx, parent=inverter) for idx in range(len(solaredge_modbus.METER_REGISTER_OFFSETS))]
+        + [solaredge_modbus.Battery(offset=idx, parent=inverter) for idx in range(len(solaredge_modbus.BATTERY_REGISTER_OFFSETS))]
+    )
+
+
+def test_planned_blocks():
+    # Every block of a read plan decodes as its values do on their own, in
+    # the word order of the device
+    for device in devices():
+        for block in device._plan(solaredge_modbus.registerType.HOLDING):
+            words = registers(block.length, f"{device.model}-{block.offset}")
+
+            assert block.decoder.decode(words) == reference(block.values, words, block.offset, device._wordorder(block.offset))
@@ -0,0 +1,83 @@
+import random
+import struct
+
+import pytest
+
+import solaredge_modbus
+from solaredge_modbus import LazyValues
+
+
+def devices():
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=1502)
+
+    return (
+        [inverter, solaredge_modbus.StorEdge(parent=inverter)]
+        + [solaredge_modbus.Meter(offset=idx, parent=inverter) for idx in range(len(solaredge_modbus.METER_REGISTER_OFFSETS))]
+        + [solaredge_modbus.Battery(offset=idx, parent=inverter) for idx in range(len(solaredge_modbus.BATTERY_REGISTER_OFFSETS))]
+    )
+
+
+def blocks(device, seed):
+    # Random register data for every block of the read plan of device
+    rnd = random.Random(seed)
+
+    for block in device._plan(solaredge_modbus.registerType.HOLDING):
+        words = [rnd.choice([0x0000, 0x8000, 0xffff, rnd.randrange(0x10000)]) for i in range(block.length)]
+        yield block, struct.pack(f">{block.length}H", *words)
+
+
+@pytest.mark.parametrize("scaled", [False, True])
+def test_lazy_values(scaled):
+    for device in devices():
+        payloads = list(blocks(device, device.model))
+        expected = {}
+        lazy = LazyValues({"cached": 1}, device._scale_index() if scaled else None)
+
+        for block, payload in payloads:
+            expected.update(block.decoder.decode_payload(payload))
+            lazy.add(block.decoder, payload)
+
+        if scaled:
+            device._scaled(expected)
+
+        expected["cached"] = 1
+
+        assert len(lazy) == len(expected)
+        assert set(lazy) == set(expected)
+        assert lazy.to_dict() == expected
+
+        # Values decode on their own, in any order, as they do in a block
+        for k in reversed(list(expected)):
+            assert lazy[k] == expected[k], k
+
+        assert dict(lazy) == expected
+        assert "nope" not in lazy
+
+        with pytest.raises(KeyError):
+            lazy["nope"]
+
+
+def test_raw():
+    device = devices()[0]
+    block, payload = next(blocks(device, "raw"))
+    lazy = LazyValues({"cached": 1})
+    lazy.add(block.decoder, memoryview(payload))
+
+    assert lazy.raw("cached") is None
+
+    for k, v in block.values.items():
+        position = (v.address - block.offset) * 2
+        assert lazy.raw(k) == list(struct.unpack_from(f">{v.length}H", payload, position))
+
+
+def test_read_all(simulator):
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=simulator.port)
+    site = simulator.inverters[1]
+    site.read(0, 1)
+    site.update = lambda now=None: None
+
+    for scaled in (False, True):
+        lazy = inverter.read_all(scaled=scaled, lazy=True)
+
+        assert isinstance(lazy, LazyValues)
+        assert lazy.to_dict() == inverter.read_all(scaled=scaled)
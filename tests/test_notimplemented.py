@@ -0,0 +1,62 @@
+import pytest
+
+import solaredge_modbus
+
+
+REGISTERS = solaredge_modbus.Inverter._register_table()
+
+
+def site(simulator, **values):
+    # Store raw register words in the simulated inverter
+    inverter = simulator.inverters[1]
+
+    for key, words in values.items():
+        inverter.write(REGISTERS[key].address, words)
+
+    return solaredge_modbus.Inverter(host="127.0.0.1", port=simulator.port)
+
+
+def test_read(simulator):
+    inverter = site(simulator, power_ac=[0x8000], reactive_power_config=[0x8000, 0x0000], current_scale=[0x8000], power_dc=[0xffff])
+
+    assert inverter.read("power_ac") == {"power_ac": 0}
+    assert inverter.read("reactive_power_config") == {"reactive_power_config": 0}
+    assert inverter.read("current_scale") == {"current_scale": -32768}
+    assert inverter.read("power_dc") == {"power_dc": -1}
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_read_all(simulator, lazy):
+    inverter = site(simulator, power_ac=[0x8000], reactive_power_config=[0x8000, 0x0000], current_scale=[0x8000], power_dc=[0xffff])
+    values = inverter.read_all(lazy=lazy)
+
+    assert values["power_ac"] == 0
+    assert values["reactive_power_config"] == 0
+    assert values["current_scale"] == -32768
+    assert values["power_dc"] == -1
+
+    # Values of a scale factor that is not implemented are not either
+    scaled = inverter.read_all(scaled=True, lazy=lazy)
+
+    assert scaled["current_scale"] == -32768
+    assert scaled["current"] == 0.0
+    assert scaled["l1_current"] == 0.0
+
+
+def test_vectorized(simulator):
+    numpy = pytest.importorskip("numpy")
+    from solaredge_modbus import vectorized
+
+    inverter = simulator.inverters[1]
+    inverter.write(REGISTERS["power_ac"].address, [0x8000])
+    inverter.write(REGISTERS["current_scale"].address, [0x8000])
+    inverter.write(REGISTERS["power_dc"].address, [0xffff])
+
+    start = REGISTERS["c_id"].address
+    end = REGISTERS["vendor_status"].address
+    columns = vectorized.decode(solaredge_modbus.Inverter, numpy.array([inverter.read(start, end - start)]), address=start)
+
+    assert columns["power_ac"].mask[0]
+    assert columns["current_scale"].mask[0]
+    assert not columns["power_dc"].mask[0]
+    assert columns["power_dc"][0] == -1
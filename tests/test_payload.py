@@ -0,0 +1,53 @@
+import struct
+
+from pymodbus.constants import Endian
+from pymodbus.payload import BinaryPayloadDecoder
+
+import solaredge_modbus
+from solaredge_modbus import ReadHoldingBlockResponse
+
+
+def frozen(simulator):
+    # Stop the simulated site from changing, so its register memory is what
+    # every read returns
+    site = simulator.inverters[1]
+    site.read(0, 1)
+    site.update = lambda now=None: None
+
+    return site
+
+
+def reference(device, memory):
+    # Decode every value on its own with pymodbus, the way read() does
+    results = {}
+
+    for k, v in device.registers.items():
+        words = [memory.get(v.address + i, 0) for i in range(v.length)]
+        data = BinaryPayloadDecoder.fromRegisters(words, byteorder=Endian.BIG, wordorder=device._wordorder(v.address))
+        results[k] = device._decode_value(data, v.length, v.dtype, v.vtype, k.endswith("_scale"))
+
+    return results
+
+
+def test_response_payload():
+    words = [0x1234, 0x8000, 0xffff]
+    data = bytearray([len(words) * 2]) + struct.pack(">3H", *words) + b"\x00\x00"
+    response = ReadHoldingBlockResponse()
+    response.decode(data)
+
+    # The register data is a view of the received bytes, not a copy
+    assert isinstance(response.payload, memoryview)
+    assert response.payload.obj is data
+    assert bytes(response.payload) == struct.pack(">3H", *words)
+    assert response.registers == words
+
+
+def test_read_all(simulator):
+    site = frozen(simulator)
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=simulator.port)
+    devices = [inverter, solaredge_modbus.StorEdge(parent=inverter)] + list(inverter.meters().values()) + list(inverter.batteries().values())
+
+    assert len(devices) == 4
+
+    for device in devices:
+        assert device.read_all() == reference(device, site.memory), device
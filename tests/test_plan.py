@@ -0,0 +1,87 @@
+import pytest
+
+import solaredge_modbus
+from solaredge_modbus import MAX_REGISTERS
+from solaredge_modbus import Register
+from solaredge_modbus import registerDataType
+from solaredge_modbus import registerType
+
+
+def table(*spans):
+    # UINT16 registers at every address of the given (start, end) spans
+    return {
+        f"r{address}": Register(address, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1)
+        for start, end in spans
+        for address in range(start, end)
+    }
+
+
+def spans(blocks):
+    return [(min(v.address for v in block.values()), max(v.address + v.length for v in block.values())) for block in blocks]
+
+
+def test_register_limit():
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=1502)
+
+    assert spans(inverter._build_plan(table((0, 300)))) == [(0, 125), (125, 250), (250, 300)]
+
+
+@pytest.mark.parametrize("max_gap", [0, 8, 64])
+def test_max_gap(max_gap):
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=1502, max_gap=max_gap)
+
+    # A gap of max_gap registers is read through, a larger one is not
+    assert spans(inverter._build_plan(table((0, 10), (10 + max_gap, 20 + max_gap)))) == [(0, 20 + max_gap)]
+    assert spans(inverter._build_plan(table((0, 10), (11 + max_gap, 21 + max_gap)))) == [(0, 10), (11 + max_gap, 21 + max_gap)]
+
+
+def devices(max_gap):
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=1502, max_gap=max_gap)
+
+    return (
+        [inverter, solaredge_modbus.StorEdge(parent=inverter)]
+        + [solaredge_modbus.Meter(offset=idx, parent=inverter) for idx in range(len(solaredge_modbus.METER_REGISTER_OFFSETS))]
+        + [solaredge_modbus.Battery(offset=idx, parent=inverter) for idx in range(len(solaredge_modbus.BATTERY_REGISTER_OFFSETS))]
+    )
+
+
+@pytest.mark.parametrize("max_gap", [0, 8, 64])
+def test_device_plans(max_gap):
+    for device in devices(max_gap):
+        plan = device._plan(registerType.HOLDING)
+        keys = [k for block in plan for k in block.values]
+
+        # Every register is read exactly once
+        assert sorted(keys) == sorted(k for k, v in device.registers.items() if v.rtype == registerType.HOLDING)
+
+        for block in plan:
+            values = sorted(block.values.values(), key=lambda v: v.address)
+
+            assert block.length <= MAX_REGISTERS
+            assert block.offset == values[0].address
+            assert len({device._wordorder(v.address) for v in values}) == 1
+
+            for previous, value in zip(values, values[1:]):
+                assert (value.address - (previous.address + previous.length)) <= max_gap
+
+
+def test_read_many_plan():
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=1502)
+    keys = inverter._many(["power_ac", "rc_charge_limit", "export_control_mode"])
+    plan = inverter._plan(registerType.HOLDING, keys)
+
+    assert sorted(k for block in plan for k in block.values) == sorted(keys)
+    assert len(plan) == 3
+    assert inverter._plan(registerType.HOLDING, keys) is plan
+
+
+def test_plan_cache_bounded():
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=1502)
+    keys = sorted(inverter.registers)
+
+    for start in range(len(keys) - 1):
+        for end in range(start + 1, min(start + 8, len(keys))):
+            inverter._plan(registerType.HOLDING, frozenset(keys[start:end]))
+
+    assert len(solaredge_modbus.SolarEdge._plans) <= solaredge_modbus.PLAN_CACHE_SIZE
+    assert len(solaredge_modbus.SolarEdge._blocks) <= solaredge_modbus.BLOCK_CACHE_SIZE
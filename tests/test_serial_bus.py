@@ -0,0 +1,144 @@
+import os
+import struct
+import threading
+import time
+
+import pytest
+from pymodbus.utilities import computeCRC
+
+import solaredge_modbus
+
+
+pty = pytest.importorskip("pty")
+tty = pytest.importorskip("tty")
+
+READS = 10
+
+
+class RtuResponder:
+
+    def __init__(self, delay=0.002):
+        # A Modbus RTU device on the far end of a pseudo terminal. It answers
+        # read holding registers requests for any unit with zeros, after
+        # delay seconds, and records when every request arrived and when its
+        # response was sent.
+        self.delay = delay
+        self.requests = []
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.device = os.ttyname(self.slave)
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        data = b""
+
+        while True:
+            try:
+                data += os.read(self.master, 256)
+            except OSError:
+                return
+
+            while len(data) >= 8:
+                frame, data = data[:8], data[8:]
+                received = time.monotonic()
+                unit, function, address, count = struct.unpack(">BBHH", frame[:6])
+
+                if function != 3 or struct.unpack(">H", frame[6:])[0] != computeCRC(frame[:6]):
+                    data = b""
+                    break
+
+                time.sleep(self.delay)
+                response = bytes([unit, function, count * 2]) + bytes(count * 2)
+                os.write(self.master, response + struct.pack(">H", computeCRC(response)))
+                self.requests.append((unit, received, time.monotonic()))
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+@pytest.fixture
+def responder():
+    responder = RtuResponder()
+    yield responder
+    responder.close()
+
+
+def read(inverter, barrier):
+    barrier.wait()
+
+    for i in range(READS):
+        assert inverter.read_many(["power_ac"])
+
+
+def test_round_robin(responder):
+    inverters = [solaredge_modbus.Inverter(device=responder.device, baud=115200, unit=unit) for unit in (1, 2, 3)]
+    barrier = threading.Barrier(len(inverters))
+    threads = [threading.Thread(target=read, args=(inverter, barrier)) for inverter in inverters]
+
+    assert inverters[0].client is inverters[1].client is inverters[2].client
+
+    # Open the port and build the read plan up front, so every unit starts
+    # queueing reads at once
+    for inverter in inverters:
+        assert inverter.read_many(["power_ac"])
+
+    del responder.requests[:]
+    before = inverters[0].client.stats()
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # While every unit has a request queued, units are served in turn
+    units = [unit for unit, received, sent in responder.requests]
+
+    assert len(units) == READS * len(inverters)
+
+    for i in range(len(units) - len(inverters)):
+        assert len(set(units[i:i + len(inverters)])) == len(inverters), units
+
+    stats = inverters[0].client.stats()
+
+    assert set(stats["units"]) == {1, 2, 3}
+
+    for unit, counters in stats["units"].items():
+        assert (counters["requests"] - before["units"][unit]["requests"]) == READS
+        assert (counters["busy_time"] - before["units"][unit]["busy_time"]) >= READS * responder.delay
+
+    assert 0 < stats["utilisation"] <= 1
+    assert stats["busy_time"] >= sum(unit["busy_time"] for unit in stats["units"].values())
+
+
+def test_inter_frame_gap(responder):
+    inverter = solaredge_modbus.Inverter(device=responder.device, baud=9600)
+    bus = inverter.client
+
+    assert bus.gap == pytest.approx(3.5 * 11 / 9600)
+
+    for i in range(READS):
+        assert inverter.read_many(["power_ac"])
+
+    # The next request never starts within the gap after a response
+    for (unit, received, sent), (next_unit, next_received, next_sent) in zip(responder.requests, responder.requests[1:]):
+        assert (next_received - sent) >= bus.gap
+
+
+def test_fast_line_gap(responder):
+    inverter = solaredge_modbus.Inverter(device=responder.device, baud=115200)
+
+    assert inverter.client.gap == 0.00175
+
+
+def test_line_settings_mismatch(responder):
+    inverter = solaredge_modbus.Inverter(device=responder.device, baud=19200)
+
+    with pytest.raises(ValueError):
+        solaredge_modbus.Inverter(device=responder.device, baud=9600, unit=2)
+    with pytest.raises(ValueError):
+        solaredge_modbus.Inverter(device=responder.device, baud=19200, parity="E", unit=2)
+
+    assert solaredge_modbus.Inverter(device=responder.device, baud=19200, unit=2).client is inverter.client
@@ -0,0 +1,80 @@
+import pytest
+from pymodbus.constants import Endian
+from pymodbus.payload import BinaryPayloadBuilder
+
+import solaredge_modbus
+from solaredge_modbus import MAX_WRITE_REGISTERS
+from solaredge_modbus import Register
+from solaredge_modbus import registerDataType
+from solaredge_modbus import registerType
+
+
+SETTINGS = {"rc_cmd_timeout": 3600, "rc_cmd_mode": 4, "rc_charge_limit": 5000.0, "rc_discharge_limit": 2500.0}
+
+
+def little_endian():
+    # The rc_* registers are little endian
+    builder = BinaryPayloadBuilder(byteorder=Endian.BIG, wordorder=Endian.LITTLE)
+    builder.add_32bit_uint(3600)
+    builder.add_16bit_uint(4)
+    builder.add_32bit_float(5000.0)
+    builder.add_32bit_float(2500.0)
+
+    return builder.to_registers()
+
+
+def test_write_plan():
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=1502)
+
+    # Adjacent registers are written at once, in their own word order
+    assert inverter._write_plan(SETTINGS) == [(0xe00b, little_endian())]
+
+    # The commit register is written last, on its own
+    assert inverter._write_plan({"commit_power_control_settings": 1, "restore_power_control_default_settings": 0}, commit=True) == [
+        (0xf101, [0]),
+        (0xf100, [1])
+    ]
+    assert inverter._write_plan(SETTINGS, commit=True)[-1] == (0xf100, [1])
+
+    with pytest.raises(KeyError):
+        inverter._write_plan({"nope": 1})
+    with pytest.raises(KeyError):
+        solaredge_modbus.Meter(offset=0, parent=inverter)._write_plan({"power": 1}, commit=True)
+
+
+def test_write_limit():
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=1502)
+    inverter.registers = {
+        f"r{address}": Register(address, 1, registerType.HOLDING, registerDataType.UINT16, int, "", "", 1)
+        for address in range(300)
+    }
+    writes = inverter._write_plan({f"r{address}": address for address in range(300)})
+
+    assert [(address, len(registers)) for address, registers in writes] == [(0, MAX_WRITE_REGISTERS), (123, MAX_WRITE_REGISTERS), (246, 54)]
+    assert [value for address, registers in writes for value in registers] == list(range(300))
+
+
+def test_write_many(simulator):
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=simulator.port)
+    site = simulator.inverters[1]
+    requests = simulator.requests
+    results = inverter.write_many(SETTINGS, commit=True)
+
+    assert len(results) == 2
+    assert not any(result.isError() for result in results)
+    assert simulator.requests - requests == 2
+    assert [site.writes[0xe00b + i] for i in range(7)] == little_endian()
+    assert site.writes[0xf100] == 1
+
+    values = inverter.read_many(list(SETTINGS))
+
+    assert {k: values[k] for k in SETTINGS} == SETTINGS
+
+
+def test_write_many_stops_at_error(simulator):
+    inverter = solaredge_modbus.Inverter(host="127.0.0.1", port=simulator.port, unit=2)
+    results = inverter.write_many(SETTINGS, commit=True)
+
+    # The simulator has no unit 2, so the first write fails
+    assert len(results) == 1
+    assert results[0].isError()